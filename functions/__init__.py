@@ -1,2 +1,10 @@
 from functions.crud import CRUDFunctions
-from functions.validations import ValidationsHelper
\ No newline at end of file
+from functions.validations import ValidationsHelper
+from functions.archive import ArchiveFunctions
+from functions.stats import StatsFunctions
+from functions.snapshot import SnapshotFunctions
+from functions.search import SearchFunctions
+from functions.maintenance import MaintenanceFunctions
+from functions.retry import RetryPolicy
+from functions.jobs import BackgroundJob
+from functions.flare import FlareFunctions
\ No newline at end of file
@@ -0,0 +1,278 @@
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from sqlalchemy import create_engine, MetaData, Table, Column, select, union_all, and_, func, null, text
+
+from model import Session, Record, Event, archive_path, value_histogram_inserts
+
+# quantidade de dias que os dados permanecem no banco principal antes de serem arquivados
+archive_horizon_days = int(os.environ.get("ARCHIVE_HORIZON_DAYS", 365))
+
+# quantidade máxima de bancos anexados a uma conexão (SQLITE_MAX_ATTACHED, 10 por padrão)
+max_attached_archives = 10
+
+# resultado da verificação de cada arquivo, refeita apenas quando o arquivo muda
+_archive_checks = {}
+
+class ArchiveFunctions():
+
+    # tabelas que são movidas para os arquivos de arquivamento
+    archived_tables = (Record.__table__, Event.__table__)
+
+    def archive_file(self, year):
+        # caminho do arquivo de arquivamento do ano informado
+        return os.path.join(archive_path, "controle_dor_%s.sqlite3" % year)
+
+    def archive_schema(self, year):
+        # nome com o qual o arquivo do ano é anexado (ATTACH) à conexão
+        return "archive_%s" % year
+
+    def is_archive(self, file):
+        # um arquivo só é considerado arquivamento depois que as suas tabelas existem
+        # (um ATTACH interrompido deixa para trás um arquivo vazio)
+        stat = os.stat(file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        checked = _archive_checks.get(file)
+        if checked is None or checked[0] != version:
+            try:
+                with closing(sqlite3.connect("file:%s?mode=ro" % file, uri=True)) as connection:
+                    names = { row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'") }
+                valid = all(table.name in names for table in self.archived_tables)
+            except sqlite3.DatabaseError:
+                valid = False
+            checked = _archive_checks[file] = (version, valid)
+        return checked[1]
+
+    def archived_years(self):
+        # lista os anos que possuem arquivo de arquivamento
+        years = []
+        for file_name in os.listdir(archive_path):
+            match = re.fullmatch(r"controle_dor_(\d{4})\.sqlite3", file_name)
+            if match and self.is_archive(os.path.join(archive_path, file_name)):
+                years.append(match.group(1))
+        return sorted(years)
+
+    def years_in_range(self, start_date=None, end_date=None):
+        # retorna apenas os anos arquivados que podem conter dados do período informado
+        years = self.archived_years()
+        if start_date:
+            years = [year for year in years if year >= start_date[:4]]
+        if end_date:
+            years = [year for year in years if year <= end_date[:4]]
+        return years
+
+    def exceeds_attach_limit(self, start_date=None, end_date=None):
+        # verifica se o período alcança mais anos arquivados do que podem ser anexados a uma conexão
+        # (sem período nenhum arquivo é anexado)
+        if not start_date and not end_date:
+            return False
+        return len(self.years_in_range(start_date, end_date)) > max_attached_archives
+
+    def windows(self):
+        """ Divide todo o histórico em períodos de anos completos, cada um com no máximo max_attached_archives
+        anos arquivados, para que o histórico inteiro possa ser percorrido período a período
+        (com até max_attached_archives anos arquivados o histórico inteiro é um único período)
+        """
+        years = self.archived_years()
+        windows = []
+        start_date = "0000-01-01"
+        for i in range(0, len(years), max_attached_archives):
+            if i + max_attached_archives >= len(years):
+                # o último período inclui também os dados ainda não arquivados
+                break
+            last_year = years[i + max_attached_archives - 1]
+            windows.append((start_date, last_year + "-12-31"))
+            start_date = "%04d-01-01" % (int(last_year) + 1)
+        windows.append((start_date, "9999-12-31"))
+        return windows
+
+    def scan(self, table, function):
+        """ Percorre todo o histórico da tabela (banco principal e arquivos), chamando function(session, source)
+        para cada período de windows(), em ordem cronológica e cada um numa sessão de leitura própria
+        (a conexão é fechada ao fim de cada período, o que desanexa os arquivos)
+        """
+        for start_date, end_date in self.windows():
+            session = Session()
+            try:
+                function(session, self.source(session, table, start_date, end_date))
+            finally:
+                session.close()
+
+    def attach(self, session, years):
+        # anexa na conexão da sessão os arquivos dos anos informados, ignorando os que já estão anexados
+        attached = [row[1] for row in session.execute(text("PRAGMA database_list")).all()]
+        schemas = []
+        for year in years:
+            schema = self.archive_schema(year)
+            if schema not in attached:
+                session.execute(text("ATTACH DATABASE :file AS " + schema), { "file": self.archive_file(year) })
+            schemas.append(schema)
+        return schemas
+
+    def detach(self, session):
+        # desanexa da conexão da sessão todos os arquivos anexados
+        for row in session.execute(text("PRAGMA database_list")).all():
+            if row[1].startswith("archive_"):
+                session.execute(text("DETACH DATABASE " + row[1]))
+
+    # colunas que só fazem sentido nos dados ativos (os dados arquivados não são mais atualizados)
+    unarchived_columns = ("version",)
+
+    def archive_table(self, table, schema):
+        # cria a representação da tabela dentro do banco anexado (sem as foreign keys do banco principal)
+        metadata = MetaData()
+        columns = [
+            Column(c.name, c.type, primary_key=c.primary_key)
+            for c in table.columns if c.name not in self.unarchived_columns
+        ]
+        return Table(table.name, metadata, *columns, schema=schema)
+
+    def source(self, session, table, start_date=None, end_date=None):
+        """ Retorna a origem dos dados da tabela para o período informado
+
+        Quando o período alcança anos arquivados, os arquivos correspondentes são anexados
+        e os dados são unidos aos do banco principal. Anos fora do período não são consultados.
+        Sem período informado todos os anos arquivados são consultados (ver read() para mais de max_attached_archives).
+        """
+        years = self.years_in_range(start_date, end_date)
+        # sem nenhum arquivo no período a própria tabela é a origem dos dados
+        if not years and not start_date and not end_date:
+            return table
+        if len(years) > max_attached_archives:
+            raise ValueError("O período alcança mais de %d anos arquivados" % max_attached_archives)
+        schemas = self.attach(session, years)
+
+        selects = []
+        for source_table in [table] + [self.archive_table(table, schema) for schema in schemas]:
+            # as colunas que não existem nos arquivos são retornadas como nulas
+            query = select(*[
+                source_table.c[c.name] if c.name in source_table.c else null().label(c.name)
+                for c in table.columns
+            ])
+            if start_date:
+                query = query.where(source_table.c.date >= start_date)
+            if end_date:
+                query = query.where(source_table.c.date <= end_date)
+            selects.append(query)
+
+        if len(selects) == 1:
+            return selects[0].subquery(table.name)
+        return union_all(*selects).subquery(table.name)
+
+    def read(self, session, table, function, start_date=None, end_date=None, newest_first=False):
+        """ Executa function(source) com a origem dos dados da tabela e retorna a lista de linhas resultante
+
+        Com período informado, é uma única consulta sobre source(). Sem período, todo o histórico é consultado:
+        de uma vez se os anos arquivados cabem numa conexão, senão período a período de windows() na mesma sessão,
+        desanexando os arquivos de um período antes de anexar os do próximo. Os períodos não têm datas em comum,
+        então as linhas de cada um são apenas concatenadas (do mais recente ao mais antigo com newest_first).
+        """
+        if start_date or end_date:
+            return function(self.source(session, table, start_date, end_date))
+
+        windows = self.windows()
+        if len(windows) == 1:
+            return function(self.source(session, table))
+        if newest_first:
+            windows.reverse()
+        rows = []
+        for window_start, window_end in windows:
+            rows.extend(function(self.source(session, table, window_start, window_end)))
+            self.detach(session)
+        return rows
+
+    def create_archive(self, year):
+        """ Cria o arquivo do ano com as suas tabelas, se ele ainda não for um arquivamento válido
+        O arquivo é criado com outro nome e só recebe o nome final depois que as tabelas existem
+        Retorna True se o arquivo foi criado
+        """
+        file = self.archive_file(year)
+        if os.path.exists(file) and self.is_archive(file):
+            return False
+        temporary_file = file + ".tmp"
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        engine = create_engine("sqlite:///" + temporary_file)
+        try:
+            for table in self.archived_tables:
+                self.archive_table(table, None).create(engine)
+        finally:
+            engine.dispose()
+        os.replace(temporary_file, file)
+        return True
+
+    def archive_data(self, horizon_days=archive_horizon_days):
+        """ Move os registros e eventos mais antigos que o horizonte informado para os arquivos anuais
+        Os anos são arquivados em grupos de no máximo max_attached_archives, cada grupo na sua própria transação
+        Retorna a quantidade de linhas arquivadas por tabela
+        """
+        cutoff_date = (date.today() - timedelta(days=horizon_days)).isoformat()
+        archived = { table.name: 0 for table in self.archived_tables }
+
+        # instancia a sessão
+        session = Session()
+        try:
+            # os ids não são reutilizados depois do arquivamento porque as tabelas usam AUTOINCREMENT
+            conditions = {}
+            years = set()
+            for table in self.archived_tables:
+                conditions[table.name] = table.c.date < cutoff_date
+                rows = session.query(func.substr(table.c.date, 1, 4)).filter(conditions[table.name]).distinct().all()
+                years.update(row[0] for row in rows)
+        finally:
+            session.close()
+
+        years = sorted(years)
+        for i in range(0, len(years), max_attached_archives):
+            for table_name, count in self.archive_years(years[i:i + max_attached_archives], conditions).items():
+                archived[table_name] += count
+        return archived
+
+    def archive_years(self, years, conditions):
+        # move para os arquivos dos anos informados as linhas que atendem às condições de cada tabela
+        archived = { table.name: 0 for table in self.archived_tables }
+        created = []
+
+        # instancia a sessão
+        session = Session()
+        try:
+            # os arquivos são criados com as suas tabelas fora da transação, antes de serem anexados
+            for year in years:
+                if self.create_archive(year):
+                    created.append(self.archive_file(year))
+
+            # os arquivos precisam ser anexados antes de qualquer escrita na transação
+            schemas = self.attach(session, years)
+
+            for year, schema in zip(years, schemas):
+                for table in self.archived_tables:
+                    archive_table = self.archive_table(table, schema)
+
+                    condition = and_(conditions[table.name], func.substr(table.c.date, 1, 4) == year)
+                    session.execute(archive_table.insert().from_select(
+                        [c.name for c in archive_table.columns],
+                        select(*[table.c[c.name] for c in archive_table.columns]).where(condition)
+                    ))
+                    # o histograma de valores continua contando os registros arquivados: as contagens são
+                    # somadas novamente antes que as triggers as retirem na remoção
+                    if table is Record.__table__:
+                        archived_records = select(*table.columns).where(condition).subquery()
+                        for statement in value_histogram_inserts(archived_records):
+                            session.execute(statement)
+
+                    archived[table.name] += session.execute(table.delete().where(condition)).rowcount
+
+            # commita a operação (a transação envolve o banco principal e os arquivos anexados)
+            session.commit()
+            return archived
+        except Exception:
+            session.rollback()
+            session.close()
+            # os arquivos criados por esta tentativa são removidos (a conexão fechada já os desanexou)
+            for file in created:
+                os.remove(file)
+            raise
+        finally:
+            session.close()
\ No newline at end of file
@@ -1,9 +1,29 @@
-from flask import jsonify
+from flask import jsonify, json, request, Response
+import os
+import time
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
-from model import Session
+from model import Session, SnapshotSession, data_version, snapshot_version
+from functions.snapshot import SnapshotFunctions
+from functions.retry import RetryPolicy
+from functions.single_flight import read_flights
+
+# tamanho dos lotes das deleções em massa e pausa entre eles
+delete_chunk_size = int(os.environ.get("DELETE_CHUNK_SIZE", 500))
+delete_chunk_pause_seconds = float(os.environ.get("DELETE_CHUNK_PAUSE_SECONDS", 0.01))
+
+# quantidade máxima de parâmetros num comando do sqlite (SQLITE_MAX_VARIABLE_NUMBER, 32766 desde a versão 3.32)
+max_variable_number = int(os.environ.get("SQLITE_MAX_VARIABLE_NUMBER", 32766))
+
+# mensagem retornada quando o banco continua travado após todas as tentativas
+busy_message = "O banco de dados está ocupado, tente novamente em instantes"
 
 class CRUDFunctions():
 
+    def __init__(self):
+        # política de novas tentativas das escritas que falham por trava do banco
+        self.retry = RetryPolicy()
+
     # função que converte o sqlalchemy object num objeto "normal" para ser retornado para o front
     def to_dict(self, data):
         # verifica se é uma lista de objetos ou um objeto único
@@ -17,29 +37,77 @@ class CRUDFunctions():
             # retorna o objeto único
             return { c.name: getattr(data, c.name) for c in data.__table__.columns }
 
-    def get_data(self, get_function, function_params, message):
-        try:
+    def begin_read(self, session):
+        # abre explicitamente uma transação de leitura, para que todas as consultas seguintes vejam
+        # o mesmo estado do banco (sem ela o sqlite trata cada SELECT como uma transação separada)
+        session.connection().exec_driver_sql("BEGIN")
+
+    def get_data(self, get_function, function_params, message, stale_tolerant=False):
+        # consultas que toleram dados defasados usam a cópia somente leitura, se ela estiver atualizada
+        use_snapshot = stale_tolerant and SnapshotFunctions().is_fresh()
+
+        def attempt():
             # instancia a sessão
-            session = Session()
-            # executa a get_funtion passada recebendo dados de retorno ou um erro
-            get_return = get_function(session, function_params)
+            session = SnapshotSession() if use_snapshot else Session()
+            try:
+                # executa a get_funtion passada recebendo dados de retorno ou um erro
+                return get_function(session, function_params)
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        def query():
+            try:
+                # a leitura também é repetida enquanto o banco estiver travado (o commit de uma escrita
+                # pode bloquear as leituras por mais tempo do que a espera do próprio sqlite)
+                get_return = self.retry.run(attempt)
+            except Exception as e:
+                print(str(e))
+                if self.retry.is_lock_error(e):
+                    return json.dumps({ "message": busy_message }), 503
+                return json.dumps({ "message": "Não foi possível buscar os " + message + " no banco de dados" }), 400
             # verifica se deu erro
             if type(get_return) is tuple and "error" in get_return[0]:
                 # se deu erro retorna o erro
-                return get_return
+                return json.dumps(get_return[0]), get_return[1]
             # se não deu erro erro retorna os dados
-            return { "data": get_return }
-        except Exception as e:
-            print(str(e))
-            session.rollback()
-            return { "message": "Não foi possível buscar os " + message + " no banco de dados" }, 400
-        finally:
-            session.close()    
+            return json.dumps({ "data": get_return }), 200
 
-    def add_data(self, body, insert_function, message):
-        try:
+        # requisições simultâneas à mesma rota, com os mesmos parâmetros e sobre a mesma versão dos dados,
+        # compartilham uma única consulta e a mesma resposta já serializada
+        key = (
+            request.path,
+            tuple(sorted(request.args.items(multi=True))),
+            use_snapshot,
+            snapshot_version() if use_snapshot else data_version()
+        )
+        body, status = read_flights.do(key, query, cacheable=lambda result: result[1] == 200)
+        return Response(body, status=status, mimetype="application/json")
+
+    def write(self, transaction):
+        """ Executa transaction(session) numa transação de escrita, repetindo-a enquanto o banco estiver travado
+        A transação é aberta com BEGIN IMMEDIATE, garantindo a trava de escrita antes das leituras feitas
+        pela transação (evita o deadlock de duas transações tentando promover uma trava de leitura)
+        """
+        def attempt():
             # instancia a sessão
             session = Session()
+            try:
+                session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                return transaction(session)
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        return self.retry.run(attempt)
+
+    def add_data(self, body, insert_function, message, after_insert=None):
+
+        def transaction(session):
             # executa a insert_function passada recebendo um sqlalchemy object para ser inserido ou um erro
             add_return = insert_function(body, session)
             # verifica se deu erro
@@ -52,60 +120,216 @@ class CRUDFunctions():
                     session.add(item)
             else:
                 session.add(add_return)
-            # commita a operação
-            session.commit()
-            # atualiza o sqlalchemy object
+            # envia a inserção para o banco e atualiza o sqlalchemy object ainda dentro da transação
+            # (depois do commit outra escrita já poderia ter alterado ou deletado o objeto)
+            session.flush()
             if isinstance(add_return, (list)) and len(add_return) > 0:
                 for item in add_return:
                     session.refresh(item)
             else:
                 session.refresh(add_return)
-            # transforma o sqlachmey object inserído num objeto "normal" e retorna o object e a mensagem de sucesso
-            return { "data": self.to_dict(add_return), "message": message.capitalize() + " adicionado com sucesso" }, 200
+            # executa a after_insert passada (se houver) com os objetos inseridos, na mesma transação
+            if after_insert:
+                after_insert(session, add_return if isinstance(add_return, (list)) else [add_return])
+            # transforma o sqlachmey object inserído num objeto "normal"
+            data = self.to_dict(add_return)
+            # commita a operação
+            session.commit()
+            # retorna o object e a mensagem de sucesso
+            return { "data": data, "message": message.capitalize() + " adicionado com sucesso" }, 200
+
+        try:
+            return self.write(transaction)
         except IntegrityError as e:
             print(str(e))
-            session.rollback()
             return { "error": message.capitalize() + " já existente no banco de dados" }, 409
         except Exception as e:
             print(str(e))
-            session.rollback()
+            if self.retry.is_lock_error(e):
+                return { "error": busy_message }, 503
             return { "error": "Não foi possível salvar o " + message + " no banco de dados" }, 400
-        finally:
-            session.close()
 
-    def update_data(self, body, update_function, url_parameter, message):
+    def insert_rows(self, body, object, rows_function, message, after_insert=None):
+        """ Insere várias linhas com um único INSERT ... VALUES (...), (...) RETURNING, sem criar sqlalchemy objects
+        A rows_function recebe o body e a sessão e retorna { "rows": [...], "errors": [...] } com os valores das
+        linhas válidas (cada uma com o índice do item no campo "index") e os erros dos itens inválidos, ou um erro.
+        As linhas válidas são inseridas mesmo que outros itens tenham erro; os erros são retornados junto.
+        """
+        table = object.__table__
+
+        def transaction(session):
+            # executa a rows_function passada recebendo as linhas a serem inseridas ou um erro
+            rows_return = rows_function(body, session)
+            # verifica se deu erro
+            if type(rows_return) is tuple and "error" in rows_return[0]:
+                # se deu erro retorna o erro
+                return rows_return
+            rows, errors = rows_return["rows"], rows_return["errors"]
+            if not rows:
+                return { "error": "Nenhum " + message + " válido para ser adicionado", "errors": errors }, 422
+
+            quote = session.bind.dialect.identifier_preparer.quote
+            names = [name for name in rows[0] if name != "index"]
+            inserted = []
+            # o sqlite limita a quantidade de parâmetros por comando, lotes maiores são divididos
+            chunk_rows = max_variable_number // len(names)
+            for start in range(0, len(rows), chunk_rows):
+                chunk = rows[start:start + chunk_rows]
+                params = {}
+                values = []
+                for i, row in enumerate(chunk):
+                    values.append("(%s)" % ", ".join(":%s_%d" % (name, i) for name in names))
+                    params.update({ "%s_%d" % (name, i): row[name] for name in names })
+                sql = "INSERT INTO %s (%s) VALUES %s RETURNING %s" % (
+                    quote(table.name),
+                    ", ".join(quote(name) for name in names),
+                    ", ".join(values),
+                    ", ".join(quote(c.name) for c in table.columns)
+                )
+                # a ordem das linhas do RETURNING não é garantida, mas os ids são gerados na ordem dos VALUES
+                returned = sorted(session.execute(text(sql), params).all(), key=lambda r: r.id)
+                inserted.extend(returned)
+
+            # executa a after_insert passada (se houver) com as linhas inseridas, na mesma transação
+            if after_insert:
+                after_insert(session, inserted)
+            data = [dict(row._mapping, index=row_values["index"]) for row, row_values in zip(inserted, rows)]
+            # commita a operação
+            session.commit()
+            # retorna as linhas inseridas, os erros dos itens inválidos e a mensagem de sucesso
+            return {
+                "data": data,
+                "errors": errors,
+                "message": "%d de %d %ss adicionados com sucesso" % (len(data), len(data) + len(errors), message)
+            }, 200
+
         try:
-            # instancia a sessão
-            session = Session()
+            return self.write(transaction)
+        except IntegrityError as e:
+            print(str(e))
+            return { "error": message.capitalize() + " já existente no banco de dados" }, 409
+        except Exception as e:
+            print(str(e))
+            if self.retry.is_lock_error(e):
+                return { "error": busy_message }, 503
+            return { "error": "Não foi possível salvar os " + message + "s no banco de dados" }, 400
+
+    def update_data(self, body, update_function, url_parameter, message):
+
+        def transaction(session):
             # executa a update_function passada recebendo o sqlalchemy object que foi atualizado ou um erro
             update_return = update_function(body, session, url_parameter)
             # verifica se deu erro
             if type(update_return) is tuple and "error" in update_return[0]:
                 # se deu erro retorna o erro
                 return update_return
-            # se não deu erro commita a operação
+            # se não deu erro envia a atualização e transforma o sqlachmey object atualizado num objeto "normal"
+            # ainda dentro da transação (depois do commit outra escrita já poderia ter alterado o objeto)
+            session.flush()
+            session.expire_all()
+            data = self.to_dict(update_return)
+            # commita a operação
             session.commit()
-            # transforma o sqlachmey object atualizado num objeto "normal" e retorna o dict object e a mensagem de sucesso
-            return { "data": self.to_dict(update_return), "message": message.capitalize() + " atualizado com sucesso" }, 200
+            # retorna o dict object e a mensagem de sucesso
+            return { "data": data, "message": message.capitalize() + " atualizado com sucesso" }, 200
+
+        try:
+            return self.write(transaction)
         except IntegrityError as e:
             print(str(e))
-            session.rollback()
             return { "error": "Já existe um " + message + " com este nome" }, 409
         except Exception as e:
             print(str(e))
-            session.rollback()
+            if self.retry.is_lock_error(e):
+                return { "error": busy_message }, 503
             return { "error": "Não foi possível atualizar o " + message + " no banco de dados" }, 400
-        finally:
-            session.close()
 
-    def delete_data(self, object, attribute, url_parameter, message):
+    def update_returning(self, body, object, values_function, url_parameter, message, not_found_message):
+        """ Atualiza a linha com um único UPDATE ... WHERE id = ? RETURNING, sem carregar o objeto antes
+        A values_function recebe o body e retorna os valores das colunas a serem atualizadas ou um erro.
+        Se o body trouxer a versão lida pelo cliente, a linha só é atualizada se ainda estiver nela
+        (controle de concorrência otimista); a cada atualização a versão é incrementada.
+        """
+        table = object.__table__
+        version = getattr(body, "version", None)
+
+        def transaction(session):
+            # executa a values_function passada recebendo os valores a serem atualizados ou um erro
+            values = values_function(body)
+            # verifica se deu erro
+            if type(values) is tuple and "error" in values[0]:
+                # se deu erro retorna o erro
+                return values
+
+            quote = session.bind.dialect.identifier_preparer.quote
+            sql = "UPDATE %s SET %s, version = version + 1 WHERE id = :id" % (
+                quote(table.name),
+                ", ".join("%s = :value_%s" % (quote(name), name) for name in values)
+            )
+            params = { "value_" + name: value for name, value in values.items() }
+            params["id"] = url_parameter
+            if version is not None:
+                sql += " AND version = :version"
+                params["version"] = version
+            sql += " RETURNING " + ", ".join(quote(c.name) for c in table.columns)
+
+            rows = session.execute(text(sql), params).mappings().all()
+            if not rows:
+                # só no caso de falha é feita uma leitura, para diferenciar a versão desatualizada da linha inexistente
+                if version is not None and session.query(object.id).filter(object.id == url_parameter).first():
+                    return { "error": message.capitalize() + " foi alterado por outra requisição, recarregue os dados" }, 409
+                return { "error": not_found_message }, 404
+
+            # commita a operação
+            session.commit()
+            # retorna a linha atualizada e a mensagem de sucesso
+            return { "data": dict(rows[0]), "message": message.capitalize() + " atualizado com sucesso" }, 200
+
         try:
-            # instancia a sessão
-            session = Session()
+            return self.write(transaction)
+        except IntegrityError as e:
+            print(str(e))
+            return { "error": "Já existe um " + message + " com este nome" }, 409
+        except Exception as e:
+            print(str(e))
+            if self.retry.is_lock_error(e):
+                return { "error": busy_message }, 503
+            return { "error": "Não foi possível atualizar o " + message + " no banco de dados" }, 400
+
+    def delete_chunks(self, object, attribute, url_parameter, chunk_size):
+        """ Deleta as linhas em lotes de no máximo chunk_size, cada lote na sua própria transação
+        Entre os lotes a trava de escrita é liberada para que outras escritas possam ser feitas
+        Retorna a quantidade total de linhas deletadas
+        """
+        def transaction(session):
+            chunk = session.query(object.id).filter(attribute == url_parameter).limit(chunk_size).scalar_subquery()
+            deleted = session.query(object).filter(object.id.in_(chunk)).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+
+        count = 0
+        while True:
+            deleted = self.write(transaction)
+            count += deleted
+            if deleted < chunk_size:
+                return count
+            time.sleep(delete_chunk_pause_seconds)
+
+    def delete_data(self, object, attribute, url_parameter, message, chunk_size=None):
+
+        def transaction(session):
             # deleta o objeto guardando a quantidade de linhas deletadas
             count = session.query(object).filter(attribute == url_parameter).delete()
             # commita a operação
             session.commit()
+            return count
+
+        try:
+            if chunk_size:
+                # deleta em lotes (os lotes já deletados não são desfeitos se um lote posterior falhar)
+                count = self.delete_chunks(object, attribute, url_parameter, chunk_size)
+            else:
+                count = self.write(transaction)
             # verifica se alguma linha foi afetada e retorna uma mensagem de sucesso ou erro
             if count:
                 return { "message": message.capitalize() + " deletado com sucesso" }, 200
@@ -113,11 +337,9 @@ class CRUDFunctions():
                 return { "message": message.capitalize() + " não encontrado no banco de dados" }, 404
         except IntegrityError as e:
             print(str(e))
-            session.rollback()
             return { "message": "Não é possível deletar este registro do banco de dados" }, 409
         except Exception as e:
             print(str(e))
-            session.rollback()
-            return { "message": "Não foi possível deletar o registro do banco de dados" }, 400
-        finally:
-            session.close()
\ No newline at end of file
+            if self.retry.is_lock_error(e):
+                return { "message": busy_message }, 503
+            return { "message": "Não foi possível deletar o registro do banco de dados" }, 400
\ No newline at end of file
@@ -0,0 +1,134 @@
+import math
+import os
+
+from model import FlareState, FlareEpisode, Record
+from functions.archive import ArchiveFunctions
+
+# peso dos valores novos na média e na variância móveis (quanto maior, mais rápido a média acompanha os valores)
+flare_alpha = float(os.environ.get("FLARE_ALPHA", 0.1))
+# folga (em desvios padrão) descontada de cada valor no CUSUM: desvios menores que ela não acumulam
+flare_k = float(os.environ.get("FLARE_K", 0.5))
+# limite (em desvios padrão acumulados) a partir do qual o CUSUM abre um episódio de crise
+flare_h = float(os.environ.get("FLARE_H", 4))
+# desvio padronizado a partir do qual um único valor é considerado anômalo
+flare_z = float(os.environ.get("FLARE_Z", 2.5))
+# quantidade de valores recebidos antes que anomalias e crises sejam sinalizadas
+flare_min_samples = int(os.environ.get("FLARE_MIN_SAMPLES", 10))
+# menor desvio padrão considerado, evita que valores sempre iguais tornem qualquer mudança uma anomalia
+flare_min_std = float(os.environ.get("FLARE_MIN_STD", 0.5))
+
+# quantidade de registros lidos por vez na reconstrução do estado
+flare_rebuild_batch_size = 1000
+
+class FlareFunctions():
+
+    def std(self, state):
+        return max(math.sqrt(state.variance or 0), flare_min_std)
+
+    def update(self, state, value, date, time, episode):
+        """ Atualiza o estado do tipo de registro com um novo valor em tempo constante
+        Os valores são considerados na ordem em que chegam (um registro retroativo entra como o mais recente).
+        Recebe o episódio de crise aberto do tipo de registro (ou None) e retorna o que continua aberto
+        depois do valor: o mesmo episódio, um episódio novo ou None se ele foi fechado.
+        """
+        if state.count == 0:
+            # o primeiro valor apenas inicia a média
+            state.mean = value
+            state.variance = 0
+            state.last_z = 0
+        else:
+            # o valor é comparado com a média e a variância anteriores a ele
+            diff = value - state.mean
+            z = diff / self.std(state)
+            warm = state.count >= flare_min_samples
+            state.last_z = z
+            state.cusum = max(0.0, state.cusum + z - flare_k)
+            state.anomaly = warm and z >= flare_z
+
+            if episode is None and warm and state.cusum > flare_h:
+                # o CUSUM passou do limite: abre um episódio de crise
+                episode = FlareEpisode(state.record_type_id, date, time, value, state.cusum)
+            elif episode is not None:
+                episode.peak_value = max(episode.peak_value, value)
+                episode.peak_cusum = max(episode.peak_cusum, state.cusum)
+                if state.cusum == 0:
+                    # os valores voltaram ao normal: fecha o episódio
+                    episode.end_date = date
+                    episode.end_time = time
+                    episode = None
+
+            # média e variância móveis exponenciais
+            state.mean = state.mean + flare_alpha * diff
+            state.variance = (1 - flare_alpha) * (state.variance + flare_alpha * diff * diff)
+
+        state.count += 1
+        state.last_value = value
+        state.last_date = date
+        state.last_time = time
+        return episode
+
+    def update_records(self, session, records):
+        """ Atualiza os estados com os registros recém inseridos, dentro da transação da inserção
+        Lê apenas o estado e o episódio aberto de cada tipo de registro envolvido, nunca os registros
+        """
+        states = {}
+        episodes = {}
+        for record in sorted(records, key=lambda r: (r.date, r.time, r.id)):
+            state = states.get(record.record_type_id)
+            if state is None:
+                state = session.get(FlareState, record.record_type_id)
+                if state is None:
+                    state = FlareState(record.record_type_id)
+                    session.add(state)
+                states[record.record_type_id] = state
+                if state.open_episode_id is not None:
+                    episodes[record.record_type_id] = session.get(FlareEpisode, state.open_episode_id)
+            episode = self.update(state, record.value, record.date, record.time, episodes.get(record.record_type_id))
+            if episode is not None and episode.id is None:
+                # episódio novo: precisa de um id para ser referenciado pelo estado
+                session.add(episode)
+                session.flush()
+            state.open_episode_id = episode.id if episode is not None else None
+            episodes[record.record_type_id] = episode
+        session.flush()
+
+    def rebuild(self, session):
+        """ Recalcula os estados e os episódios a partir de todo o histórico (inclusive o arquivado)
+        Os registros são lidos uma única vez, em ordem cronológica por tipo de registro e em lotes
+        Retorna a quantidade de tipos de registro e de episódios
+        """
+        # a trava de escrita é obtida antes da leitura do histórico (feita em outras conexões),
+        # para que nenhuma inserção feita durante a leitura fique de fora do estado recalculado
+        session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+        states = {}
+        open_episodes = {}
+        episodes = []
+
+        def replay(read_session, records):
+            query = read_session.query(records.c.record_type_id, records.c.value, records.c.date, records.c.time).order_by(
+                records.c.record_type_id, records.c.date, records.c.time, records.c.id
+            )
+            for record_type_id, value, date, time in query.yield_per(flare_rebuild_batch_size):
+                state = states.get(record_type_id)
+                if state is None:
+                    state = states[record_type_id] = FlareState(record_type_id)
+                previous = open_episodes.get(record_type_id)
+                episode = self.update(state, value, date, time, previous)
+                if episode is not None and episode is not previous:
+                    episodes.append(episode)
+                open_episodes[record_type_id] = episode
+
+        # os períodos do histórico são percorridos em ordem cronológica
+        ArchiveFunctions().scan(Record.__table__, replay)
+
+        session.query(FlareState).delete()
+        session.query(FlareEpisode).delete()
+        # os episódios são gravados depois da leitura, para que os ids dos abertos sejam atribuídos aos estados
+        session.add_all(episodes)
+        session.flush()
+        for state in states.values():
+            episode = open_episodes.get(state.record_type_id)
+            state.open_episode_id = episode.id if episode is not None else None
+        session.add_all(states.values())
+        return len(states), len(episodes)
\ No newline at end of file
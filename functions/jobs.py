@@ -0,0 +1,51 @@
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # sem fcntl (windows) os jobs rodam sem a trava entre processos
+    fcntl = None
+
+class BackgroundJob():
+
+    def __init__(self, name, interval, function, lock_file=None):
+        self.name = name
+        self.interval = interval
+        self.function = function
+        # arquivo de trava que garante que, com vários processos, só um deles execute o job
+        self.lock_file = lock_file
+        self.lock = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def acquire_lock(self):
+        # tenta obter (sem esperar) a trava do job, que fica com o processo até ele terminar
+        if self.lock is not None or self.lock_file is None or fcntl is None:
+            return True
+        lock = open(self.lock_file, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self.lock = lock
+        return True
+
+    def run(self):
+        # executa a função imediatamente e depois a cada intervalo, até o job ser parado
+        while True:
+            try:
+                if self.acquire_lock():
+                    self.function()
+            except Exception as e:
+                print("Erro ao executar o job " + self.name + ": " + str(e))
+            if self.stop_event.wait(self.interval):
+                break
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from model import db_file
+
+# intervalo sem escritas no banco para que o período seja considerado tranquilo
+maintenance_quiet_seconds = int(os.environ.get("MAINTENANCE_QUIET_SECONDS", 600))
+# intervalo mínimo entre duas manutenções
+maintenance_interval_seconds = int(os.environ.get("MAINTENANCE_INTERVAL_SECONDS", 6 * 3600))
+# intervalo entre as verificações do job de manutenção
+maintenance_check_seconds = int(os.environ.get("MAINTENANCE_CHECK_SECONDS", 300))
+# quantidade de páginas devolvidas ao sistema de arquivos por transação do incremental_vacuum
+maintenance_vacuum_pages = int(os.environ.get("MAINTENANCE_VACUUM_PAGES", 1000))
+
+class MaintenanceFunctions():
+
+    def __init__(self):
+        self.last_run = None
+
+    def is_quiet(self):
+        # o arquivo do banco é modificado a cada commit, então a data de modificação indica a última escrita
+        return time.time() - os.path.getmtime(db_file) >= maintenance_quiet_seconds
+
+    def run(self):
+        """ Devolve as páginas livres do banco e atualiza as estatísticas usadas pelo planejador de consultas
+        Retorna a quantidade de páginas devolvidas
+        """
+        with closing(sqlite3.connect(db_file, isolation_level=None)) as connection:
+            released = 0
+            free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            while free_pages > 0:
+                # cada chamada é uma transação curta, liberando a trava de escrita entre os lotes
+                # (executescript executa o pragma até o fim; execute devolveria apenas uma página)
+                connection.executescript("PRAGMA incremental_vacuum(%d);" % maintenance_vacuum_pages)
+                remaining_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+                if remaining_pages >= free_pages:
+                    break
+                released += free_pages - remaining_pages
+                free_pages = remaining_pages
+            connection.execute("ANALYZE")
+            connection.execute("PRAGMA optimize")
+        self.last_run = time.time()
+        return released
+
+    def run_if_quiet(self):
+        # executa a manutenção apenas em períodos sem escritas e respeitando o intervalo mínimo
+        if self.last_run is not None and time.time() - self.last_run < maintenance_interval_seconds:
+            return
+        if self.is_quiet():
+            self.run()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from sqlalchemy.exc import OperationalError
+
+# tempo máximo gasto repetindo uma transação enquanto o banco estiver travado
+retry_deadline_seconds = float(os.environ.get("RETRY_DEADLINE_SECONDS", 10))
+# espera inicial e máxima entre as tentativas (backoff exponencial com jitter)
+retry_base_delay_seconds = float(os.environ.get("RETRY_BASE_DELAY_SECONDS", 0.005))
+retry_max_delay_seconds = float(os.environ.get("RETRY_MAX_DELAY_SECONDS", 0.5))
+
+class RetryStats():
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.recovered = 0
+        self.failures = 0
+
+    def record_retry(self, wait_seconds):
+        with self.lock:
+            self.retries += 1
+            self.wait_seconds += wait_seconds
+
+    def record_recovered(self):
+        with self.lock:
+            self.recovered += 1
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "retries": self.retries,
+                "wait_seconds": round(self.wait_seconds, 4),
+                "recovered": self.recovered,
+                "failures": self.failures
+            }
+
+# contadores do processo, expostos em /stats/retries
+retry_stats = RetryStats()
+
+class RetryPolicy():
+
+    # mensagens do sqlite para SQLITE_BUSY e SQLITE_LOCKED
+    lock_messages = ("database is locked", "database is busy", "database table is locked")
+
+    def __init__(self, deadline=retry_deadline_seconds, base_delay=retry_base_delay_seconds,
+            max_delay=retry_max_delay_seconds, stats=retry_stats):
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = stats
+
+    def is_lock_error(self, error):
+        # verifica se o erro é uma trava do banco (e não um erro de dados ou de sql)
+        if not isinstance(error, (OperationalError, sqlite3.OperationalError)):
+            return False
+        return any(message in str(error) for message in self.lock_messages)
+
+    def run(self, function):
+        """ Executa a função, repetindo-a enquanto ela falhar por trava do banco e o prazo não acabar
+        A espera entre as tentativas cresce exponencialmente, sorteada entre zero e o limite da
+        tentativa (full jitter), para que escritas concorrentes não tentem de novo ao mesmo tempo
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                result = function()
+                if attempt > 0:
+                    self.stats.record_recovered()
+                return result
+            except Exception as e:
+                if not self.is_lock_error(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if time.monotonic() - started + delay > self.deadline:
+                    self.stats.record_failure()
+                    raise
+                self.stats.record_retry(delay)
+                time.sleep(delay)
+                attempt += 1
\ No newline at end of file
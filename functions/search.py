@@ -0,0 +1,44 @@
+import re
+from sqlalchemy import text
+
+from model import event_search_rebuild
+
+class SearchFunctions():
+
+    def match_expression(self, search_text):
+        """ Converte o texto digitado numa expressão MATCH do FTS5
+        Cada palavra vira um termo entre aspas (buscado também como prefixo), evitando que a
+        sintaxe do FTS5 (aspas, operadores, parênteses) digitada pelo usuário gere erros
+        """
+        words = re.findall(r"\w+", search_text)
+        return " ".join('"%s"*' % word for word in words)
+
+    def search_events(self, session, search_text, start_date=None, end_date=None, page=1, page_size=20):
+        """ Busca os eventos cuja descrição contém as palavras informadas, ordenados por relevância
+        Retorna os eventos da página solicitada e o total de eventos encontrados
+        """
+        params = { "match": self.match_expression(search_text) }
+        if not params["match"]:
+            return [], 0
+
+        conditions = "events_fts MATCH :match"
+        if start_date:
+            conditions += " AND events.date >= :start_date"
+            params["start_date"] = start_date
+        if end_date:
+            conditions += " AND events.date <= :end_date"
+            params["end_date"] = end_date
+
+        source = "FROM events_fts JOIN events ON events.id = events_fts.rowid WHERE " + conditions
+
+        total = session.execute(text("SELECT COUNT(*) " + source), params).scalar()
+        events = session.execute(text(
+            "SELECT events.id, events.description, events.date, events.time, bm25(events_fts) AS rank "
+            + source + " ORDER BY rank, events.date DESC, events.time DESC LIMIT :limit OFFSET :offset"
+        ), { **params, "limit": page_size, "offset": (page - 1) * page_size }).all()
+
+        return events, total
+
+    def rebuild_event_search(self, session):
+        # recria o índice de busca a partir dos eventos do banco principal
+        session.execute(text(event_search_rebuild))
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+# tempo em que uma resposta de leitura bem-sucedida continua sendo reaproveitada (0 desativa o cache)
+read_cache_ttl_seconds = float(os.environ.get("READ_CACHE_TTL_SECONDS", 0))
+
+class SingleFlightCall():
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight():
+
+    def __init__(self, cache_ttl=0):
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.cache = {}
+        # contadores: requisições recebidas, consultas executadas, requisições que aguardaram uma
+        # consulta já em andamento e requisições respondidas pelo cache
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def do(self, key, function, cacheable=lambda result: True):
+        """ Executa a função uma única vez para chamadas simultâneas com a mesma chave
+        A primeira chamada executa a função; as que chegam enquanto ela está em andamento esperam e
+        recebem o mesmo resultado (ou o mesmo erro). Com cache_ttl, os resultados aceitos por
+        cacheable continuam sendo reaproveitados até expirarem.
+        """
+        with self.lock:
+            self.requests += 1
+            cached = self.cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.cache_hits += 1
+                return cached[1]
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = SingleFlightCall()
+                self.in_flight[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if self.cache_ttl > 0 and call.error is None and cacheable(call.result):
+                    now = time.monotonic()
+                    # descarta as entradas expiradas antes de guardar a nova
+                    self.cache = { k: v for k, v in self.cache.items() if v[0] > now }
+                    self.cache[key] = (now + self.cache_ttl, call.result)
+            call.done.set()
+
+    def to_dict(self):
+        with self.lock:
+            shared = self.coalesced + self.cache_hits
+            return {
+                "requests": self.requests,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "coalescing_ratio": round(shared / self.requests, 4) if self.requests else 0
+            }
+
+# leituras compartilhadas do processo, usadas por CRUDFunctions.get_data
+read_flights = SingleFlight(read_cache_ttl_seconds)
\ No newline at end of file
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import time
+
+from model import db_file, snapshot_file
+
+# intervalo entre as atualizações da cópia somente leitura
+snapshot_refresh_seconds = int(os.environ.get("SNAPSHOT_REFRESH_SECONDS", 60))
+# defasagem máxima aceita para que uma consulta seja respondida pela cópia
+snapshot_max_staleness_seconds = int(os.environ.get("SNAPSHOT_MAX_STALENESS_SECONDS", 300))
+
+class SnapshotFunctions():
+
+    def refresh(self):
+        """ Atualiza a cópia somente leitura do banco usando a API de backup online do sqlite
+        A cópia é gerada num arquivo temporário e substitui a anterior de uma vez só
+        """
+        temp_file = snapshot_file + ".tmp"
+        source = sqlite3.connect(db_file)
+        target = sqlite3.connect(temp_file)
+        try:
+            # o backup lê o banco em etapas, sem bloquear as escritas durante toda a cópia
+            source.backup(target, pages=256)
+        finally:
+            target.close()
+            source.close()
+        os.replace(temp_file, snapshot_file)
+
+    def age(self):
+        # segundos desde a última atualização da cópia ou None se ela não existe
+        if not os.path.exists(snapshot_file):
+            return None
+        return time.time() - os.path.getmtime(snapshot_file)
+
+    def is_fresh(self, max_staleness=snapshot_max_staleness_seconds):
+        # verifica se a cópia existe e está dentro da defasagem máxima aceita
+        age = self.age()
+        return age is not None and age <= max_staleness
\ No newline at end of file
@@ -0,0 +1,77 @@
+import math
+from sqlalchemy import func
+
+from model import ValueHistogram, Record, buckets_per_unit, value_histogram_selects
+from functions.archive import ArchiveFunctions
+
+class StatsFunctions():
+
+    # valores possíveis dos registros em décimos (0 a 100), cada um com a sua contagem no histograma
+    buckets = range(0, 10 * buckets_per_unit + 1)
+
+    def bucket_value(self, bucket):
+        # valor representado pelo bucket (74 -> 7.4)
+        return bucket / buckets_per_unit
+
+    def above(self, counts, threshold):
+        # soma as contagens dos valores maiores que o limite (o limite é comparado em décimos)
+        bucket_threshold = round(threshold * buckets_per_unit, 6)
+        return sum(count for bucket, count in enumerate(counts) if bucket > bucket_threshold)
+
+    def rebuild_histogram(self, session):
+        """ Recalcula todo o histograma de valores a partir dos registros do banco principal e dos arquivados
+        As contagens de cada período do histórico são somadas em memória (no máximo um valor por
+        tipo de registro, mês e bucket) e gravadas no fim, na transação da sessão informada
+        """
+        # a trava de escrita é obtida antes da leitura do histórico (feita em outras conexões),
+        # para que nenhuma alteração feita durante a leitura fique de fora das contagens
+        session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+        totals = {}
+
+        def add_counts(read_session, records):
+            for counts in value_histogram_selects(records):
+                for record_type_id, month, bucket, count, day_count in read_session.execute(counts):
+                    key = (record_type_id, month, bucket)
+                    total = totals.setdefault(key, [0, 0])
+                    total[0] += count
+                    total[1] += day_count
+
+        ArchiveFunctions().scan(Record.__table__, add_counts)
+
+        session.query(ValueHistogram).delete()
+        session.add_all(ValueHistogram(*key, *total) for key, total in totals.items())
+
+    def histogram(self, session, record_type_id, start_month=None, end_month=None):
+        """ Soma as contagens do histograma do tipo de registro no período informado
+        Retorna as listas de contagens de registros e de dias indexadas pelo valor
+        """
+        query = session.query(
+            ValueHistogram.bucket,
+            func.sum(ValueHistogram.count),
+            func.sum(ValueHistogram.day_count)
+        ).filter(ValueHistogram.record_type_id == record_type_id)
+        if start_month:
+            query = query.filter(ValueHistogram.month >= start_month)
+        if end_month:
+            query = query.filter(ValueHistogram.month <= end_month)
+
+        counts = [0 for bucket in self.buckets]
+        day_counts = [0 for bucket in self.buckets]
+        for bucket, count, day_count in query.group_by(ValueHistogram.bucket).all():
+            if bucket in self.buckets:
+                counts[bucket] = count
+                day_counts[bucket] = day_count
+        return counts, day_counts
+
+    def percentile(self, counts, percentile):
+        # percentil pelo método nearest-rank percorrendo as contagens acumuladas
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * total))
+        accumulated = 0
+        for bucket, count in enumerate(counts):
+            accumulated += count
+            if accumulated >= rank:
+                return self.bucket_value(bucket)
\ No newline at end of file
@@ -29,4 +29,64 @@ class ValidationsHelper():
             datetime.strptime(time, "%H:%M")
             return True
         except ValueError:
-            return False
\ No newline at end of file
+            return False
+
+    def is_valid_date_range(start_date, end_date):
+
+        # as datas do período são opcionais, mas se informadas precisam ser válidas
+        if start_date is not None and not ValidationsHelper.is_valid_date(start_date):
+            return False
+        if end_date is not None and not ValidationsHelper.is_valid_date(end_date):
+            return False
+
+        # verifica se o início do período não é posterior ao fim
+        if start_date is not None and end_date is not None and start_date > end_date:
+            return False
+
+        return True
+
+    def is_valid_month(month):
+
+        # verifica se o mês esta no formato adequado, senão retorna false
+        monthReg = r"^\d{4}[-]\d{2}$"
+        if not re.fullmatch(monthReg, month):
+            return False
+
+        # testa se é um mês válido e retorna true ou false
+        try:
+            datetime.strptime(month, "%Y-%m")
+            return True
+        except ValueError:
+            return False
+
+    def valid_dates(dates):
+
+        # retorna o conjunto das datas válidas entre as informadas, verificando cada data distinta uma única vez
+        # (sem expressão regular e sem strptime, que pesam quando o lote é grande)
+        valid = set()
+        for date in set(dates):
+            if len(date) != 10 or date[4] != "-" or date[7] != "-":
+                continue
+            year, month, day = date[:4], date[5:7], date[8:]
+            if not (year + month + day).isascii() or not (year + month + day).isdigit():
+                continue
+            try:
+                datetime(int(year), int(month), int(day))
+                valid.add(date)
+            except ValueError:
+                pass
+        return valid
+
+    def valid_times(times):
+
+        # retorna o conjunto das horas válidas entre as informadas, verificando cada hora distinta uma única vez
+        valid = set()
+        for time in set(times):
+            if len(time) != 5 or time[2] != ":":
+                continue
+            hour, minute = time[:2], time[3:]
+            if not (hour + minute).isascii() or not (hour + minute).isdigit():
+                continue
+            if int(hour) < 24 and int(minute) < 60:
+                valid.add(time)
+        return valid
\ No newline at end of file
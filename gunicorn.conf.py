@@ -0,0 +1,35 @@
+import os
+import multiprocessing
+
+# ------------------------------------------------------------
+# Configuração do gunicorn (gunicorn -c gunicorn.conf.py)
+# ------------------------------------------------------------
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# quantidade de processos e de threads por processo
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+
+# carrega a aplicação (e inicializa o banco) uma única vez no processo master antes do fork
+preload_app = True
+
+# reinício gradual: os workers são reciclados após uma quantidade de requisições e, no
+# encerramento ou no HUP, terminam as requisições em andamento antes de sair
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 100))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+
+def post_fork(server, worker):
+    # as conexões abertas pelo master não podem ser compartilhadas com os workers
+    from model import engine, snapshot_engine
+    engine.dispose()
+    snapshot_engine.dispose()
+
+def post_worker_init(worker):
+    # os jobs em segundo plano são iniciados em cada worker, mas só o dono da trava os executa
+    from main import start_background_jobs
+    start_background_jobs()
\ No newline at end of file
@@ -2,18 +2,37 @@ from flask import Flask, request, render_template, jsonify, redirect
 from flask_openapi3 import OpenAPI, Info, Tag
 from flask_cors import CORS
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from sqlalchemy import func, or_
+from datetime import date, timedelta
 import json
+import os
 
-from model import Session, Record, Event, RecordType
+from model import Session, Record, Event, RecordType, FlareState, FlareEpisode, ValueHistogram, db_path
 from functions import CRUDFunctions
 from functions import ValidationsHelper as validation
+from functions import ArchiveFunctions
+from functions import StatsFunctions
+from functions import SnapshotFunctions, BackgroundJob
+from functions import SearchFunctions
+from functions import MaintenanceFunctions
+from functions import FlareFunctions
+from functions.maintenance import maintenance_check_seconds
+from functions.retry import retry_stats
+from functions.single_flight import read_flights
+from functions.snapshot import snapshot_refresh_seconds
+from functions.crud import delete_chunk_size
+from functions.archive import max_attached_archives
 from schema import *
 
 info = Info(title="Controle de Dor Crônica API", version="1.0.0")
 app = OpenAPI(__name__, info=info)
 CORS(app)
 
+archive = ArchiveFunctions()
+stats = StatsFunctions()
+search = SearchFunctions()
+flare = FlareFunctions()
+
 # ------------------------------------------------------------
 # Init DB
 # ------------------------------------------------------------
@@ -26,12 +45,46 @@ def init_database():
             default_record_type = RecordType(name="dor", order=1)
             session.add(default_record_type)
             session.commit()
+        # existem registros no banco principal ou nos arquivos
+        has_records = session.query(Record.id).first() is not None or len(archive.archived_years()) > 0
+        # banco criado antes do histograma de valores: carrega as contagens dos registros já existentes
+        if has_records and session.query(ValueHistogram).count() == 0:
+            stats.rebuild_histogram(session)
+            session.commit()
+        # banco criado antes da detecção de crises: calcula o estado a partir dos registros já existentes
+        if has_records and session.query(FlareState).count() == 0:
+            flare.rebuild(session)
+            session.commit()
     except Exception as e:
         session.rollback()
         print("Erro ao tentar inicializar o banco: " + e)
     finally:
         session.close()
 
+# ------------------------------------------------------------
+# Background Jobs
+# ------------------------------------------------------------
+def start_background_jobs():
+    # com vários processos a trava garante que cada job seja executado por apenas um deles
+    return [
+        # atualiza periodicamente a cópia somente leitura usada nas consultas analíticas
+        BackgroundJob("snapshot", snapshot_refresh_seconds, SnapshotFunctions().refresh,
+            lock_file=os.path.join(db_path, "snapshot.lock")).start(),
+        # devolve páginas livres e atualiza estatísticas do banco nos períodos sem escritas
+        BackgroundJob("maintenance", maintenance_check_seconds, MaintenanceFunctions().run_if_quiet,
+            lock_file=os.path.join(db_path, "maintenance.lock")).start()
+    ]
+
+# ------------------------------------------------------------
+# App Factory
+# ------------------------------------------------------------
+def create_app():
+    """Prepara a aplicação para ser executada por um servidor WSGI de produção (gunicorn ou waitress)
+    Os jobs em segundo plano não são iniciados aqui, pois precisam rodar depois do fork dos workers
+    """
+    init_database()
+    return app
+
 # ------------------------------------------------------------
 # Render Template Routes
 # ------------------------------------------------------------
@@ -62,7 +115,8 @@ def get_record_types():
             data.append({
                 "id": record_type.id,
                 "name": record_type.name,
-                "order": record_type.order
+                "order": record_type.order,
+                "version": record_type.version
             })
 
         return data
@@ -99,17 +153,13 @@ def update_record_type(path: RecordType_IdSchema, body: RecordType_UpdateFormSch
     Retorna o objeto atualizado e uma mensagem de confirmação ou uma menasgem de erro
     """
 
-    def update_function(body, session, url_parameter):
+    def values_function(body):
 
-        record_type = session.query(RecordType).filter(RecordType.id == url_parameter).first()
-        if not record_type:
-            return { "error": "Tipo de Registro não encontrado no banco de dados" }, 404
-        record_type.name = str(body.name).lower()
-
-        return record_type
+        return { "name": str(body.name).lower() }
 
     crud = CRUDFunctions()
-    return crud.update_data(body, update_function, path.record_type_id, "tipo de registro")
+    return crud.update_returning(body, RecordType, values_function, path.record_type_id, "tipo de registro",
+        "Tipo de Registro não encontrado no banco de dados")
 
 @app.put("/update-record-type-order/", tags=[record_type_tag],
         responses={ "200": RecordType_UpdateOrderReturnSchema, "400": ErrorSchema })
@@ -129,7 +179,11 @@ def update_record_type_order(body: RecordType_UpdateOrderFormSchema):
             record_type = session.query(RecordType).filter(RecordType.id == rto.id).first()
             if not record_type:
                 return { "error": "Tipo de Registro não encontrado no banco de dados" }, 404
+            # controle de concorrência otimista: a leitura e a atualização acontecem na mesma transação de escrita
+            if rto.version is not None and record_type.version != rto.version:
+                return { "error": "Tipos de registros foram alterados por outra requisição, recarregue os dados" }, 409
             record_type.order = int(rto.order)
+            record_type.version = RecordType.version + 1
             record_types_return.append(record_type)
 
         return record_types_return
@@ -154,28 +208,41 @@ record_tag = Tag(name="Registros", description="Adição, visualização, ediç
 
 @app.get("/get-records", tags=[record_tag],
         responses={ "200": Record_ListCompleteReturnSchema, "400": ErrorSchema })
-def get_records():
-    """Pesquisa por todos os registros cadastrados
+def get_records(query: Filter_StaleDateRangeSchema):
+    """Pesquisa por todos os registros cadastrados, opcionalmente filtrando por período
+    Com stale_ok a consulta pode ser respondida pela cópia somente leitura, com alguns minutos de defasagem
     Retorna uma listagem dos registros
     """
 
     def get_function(session, params):
-        # Seleciona os dados agrupando registros que são iguais na mesma data e calculando a média destes
-        daily_records = session.query(
-            Record.id,
-            Record.date,
-            Record.time,
-            Record.record_type_id,
-            RecordType.name.label('record_type_name'),
-            func.sum(Record.value).label('total_value'),
-            func.avg(Record.value).label('average_value')
-        ).join(
-            RecordType,
-            Record.record_type_id == RecordType.id
-        ).group_by(
-            Record.date,
-            Record.record_type_id
-        ).all()
+
+        if not validation.is_valid_date_range(params["start_date"], params["end_date"]):
+            return { "error": "O período informado está inválido" }, 422
+
+        if archive.exceeds_attach_limit(params["start_date"], params["end_date"]):
+            return { "error": "O período informado alcança mais de %d anos arquivados" % max_attached_archives }, 422
+
+        def query_function(records):
+            # Seleciona os dados agrupando registros que são iguais na mesma data e calculando a média destes
+            return session.query(
+                records.c.id,
+                records.c.date,
+                records.c.time,
+                records.c.record_type_id,
+                RecordType.name.label('record_type_name'),
+                func.sum(records.c.value).label('total_value'),
+                func.avg(records.c.value).label('average_value')
+            ).join(
+                RecordType,
+                records.c.record_type_id == RecordType.id
+            ).group_by(
+                records.c.date,
+                records.c.record_type_id
+            ).all()
+
+        # busca os registros do banco principal e dos arquivos dos anos que fazem parte do período
+        # (sem período, de todo o histórico)
+        daily_records = archive.read(session, Record.__table__, query_function, params["start_date"], params["end_date"])
         
         data = []
         for record in daily_records:
@@ -191,43 +258,64 @@ def get_records():
 
         return data
 
+    # a consulta agrupa todo o histórico e, se o cliente aceitar dados defasados, pode ser respondida pela
+    # cópia somente leitura (por padrão não, pois o front-end a usa logo após uma escrita)
     crud = CRUDFunctions()
-    return crud.get_data(get_function, {}, "registros")
+    return crud.get_data(get_function, { "start_date": query.start_date, "end_date": query.end_date }, "registros",
+        stale_tolerant=query.stale_ok)
 
 @app.get("/get-records-by-record-type/<int:record_type_id>", tags=[record_tag],
         responses={ "200": Record_ListBasicReturnSchema, "400": ErrorSchema })
-def get_records_by_record_type(path: RecordType_IdSchema):
-    """Pesquisa pelos registros referentes ao tipo de registro informado como parâmetro
+def get_records_by_record_type(path: RecordType_IdSchema, query: Filter_DateRangeSchema):
+    """Pesquisa pelos registros referentes ao tipo de registro informado como parâmetro, opcionalmente filtrando por período
     Retorna uma listagem dos registros encontrados
     """
 
     def get_function(session, params):
-        # Busca os registros filtrando por tipo de registro
-        records = session.query(
-            Record,
-            RecordType.name.label('record_type_name')
-        ).join(
-            RecordType, 
-            Record.record_type_id == RecordType.id
-        ).filter(
-            Record.record_type_id == params["record_type_id"]
-        ).order_by(Record.date.desc(), Record.time.desc()).all()
+
+        if not validation.is_valid_date_range(params["start_date"], params["end_date"]):
+            return { "error": "O período informado está inválido" }, 422
+
+        if archive.exceeds_attach_limit(params["start_date"], params["end_date"]):
+            return { "error": "O período informado alcança mais de %d anos arquivados" % max_attached_archives }, 422
+
+        def query_function(records_source):
+            # Busca os registros filtrando por tipo de registro
+            return session.query(
+                records_source,
+                RecordType.name.label('record_type_name')
+            ).join(
+                RecordType, 
+                records_source.c.record_type_id == RecordType.id
+            ).filter(
+                records_source.c.record_type_id == params["record_type_id"]
+            ).order_by(records_source.c.date.desc(), records_source.c.time.desc()).all()
+
+        # busca os registros do banco principal e dos arquivos dos anos que fazem parte do período
+        # (sem período, de todo o histórico)
+        records = archive.read(session, Record.__table__, query_function, params["start_date"], params["end_date"],
+            newest_first=True)
         
         data = []
-        for record, record_type_name in records:
+        for record in records:
             data.append({
                 "id": record.id,
                 "date": record.date,
                 "time": record.time,
                 "record_type_id": record.record_type_id,
-                "record_type_name": record_type_name,
-                "value": record.value
+                "record_type_name": record.record_type_name,
+                "value": record.value,
+                "version": record.version
             })
         
         return data
 
     crud = CRUDFunctions()
-    return crud.get_data(get_function, { "record_type_id": path.record_type_id }, "registros")    
+    return crud.get_data(get_function, {
+        "record_type_id": path.record_type_id,
+        "start_date": query.start_date,
+        "end_date": query.end_date
+    }, "registros")
 
 @app.post("/add-record", tags=[record_tag],
         responses={ "200": Record_AddReturnSchema, "400": ErrorSchema })
@@ -257,7 +345,7 @@ def add_record(body: Record_AddFormSchema):
         )
 
     crud = CRUDFunctions()
-    return crud.add_data(body, insert_function, "registro")
+    return crud.add_data(body, insert_function, "registro", after_insert=flare.update_records)
 
 @app.post("/add-batch-records", tags=[record_tag],
         responses={ "200": Record_AddBatchReturnSchema, "400": ErrorSchema })
@@ -277,6 +365,12 @@ def add_batch_records(body: Record_AddBatchFormSchema):
         if not body.batch_records or len(body.batch_records) == 0:
             return { "error": "Formato de dados inválido" }, 422
 
+        # verifica todos os tipos de registro do lote numa única consulta
+        record_type_ids = { record.record_type_id for record in body.batch_records }
+        existing_ids = { row[0] for row in session.query(RecordType.id).filter(RecordType.id.in_(record_type_ids)).all() }
+        if record_type_ids - existing_ids:
+            return { "error": "Tipo de registro não encontrado no banco de dados" }, 404
+
         records = []
 
         for record in body.batch_records:
@@ -290,7 +384,49 @@ def add_batch_records(body: Record_AddBatchFormSchema):
         return records
 
     crud = CRUDFunctions()
-    return crud.add_data(body, insert_function, "registro")
+    return crud.add_data(body, insert_function, "registro", after_insert=flare.update_records)
+
+@app.post("/add-timed-batch-records", tags=[record_tag],
+        responses={ "200": Record_AddTimedBatchReturnSchema, "400": ErrorSchema })
+def add_timed_batch_records(body: Record_AddTimedBatchFormSchema):
+    """Adiciona registros em lote no banco de dados, cada um com a sua data e hora
+    Os registros válidos são inseridos num único comando e os inválidos são retornados com o erro de cada um
+    Retorna a lista de objetos inserídos, os erros dos itens inválidos e uma mensagem de confirmação ou uma mensagem de erro
+    """
+
+    def rows_function(body, session):
+
+        if not body.batch_records or len(body.batch_records) == 0:
+            return { "error": "Formato de dados inválido" }, 422
+
+        # datas e horas distintas são validadas uma única vez e os tipos de registro numa única consulta
+        valid_dates = validation.valid_dates([record.date for record in body.batch_records])
+        valid_times = validation.valid_times([record.time for record in body.batch_records])
+        record_type_ids = { record.record_type_id for record in body.batch_records }
+        existing_ids = { row[0] for row in session.query(RecordType.id).filter(RecordType.id.in_(record_type_ids)).all() }
+
+        rows = []
+        errors = []
+        for index, record in enumerate(body.batch_records):
+            if record.date not in valid_dates:
+                errors.append({ "index": index, "error": "O campo \"Data\" está inválido" })
+            elif record.time not in valid_times:
+                errors.append({ "index": index, "error": "O campo \"Hora\" está inválido" })
+            elif record.record_type_id not in existing_ids:
+                errors.append({ "index": index, "error": "Tipo de registro não encontrado no banco de dados" })
+            else:
+                rows.append({
+                    "index": index,
+                    "record_type_id": record.record_type_id,
+                    "date": record.date,
+                    "time": record.time,
+                    "value": record.value
+                })
+
+        return { "rows": rows, "errors": errors }
+
+    crud = CRUDFunctions()
+    return crud.insert_rows(body, Record, rows_function, "registro", after_insert=flare.update_records)
 
 @app.put("/update-record/<int:record_id>", tags=[record_tag],
         responses={ "200": Record_UpdateReturnSchema, "400": ErrorSchema })
@@ -299,7 +435,7 @@ def update_record(path: Record_IdSchema, body: Record_UpdateFormSchema):
     Retorna o objeto atualizado e uma mensagem de confirmação ou uma menasgem de erro
     """
 
-    def update_function(body, session, url_parameter):
+    def values_function(body):
 
         if not validation.is_valid_date(body.date):
             return { "error": "O campo \"Data\" está inválido" }, 422
@@ -307,19 +443,11 @@ def update_record(path: Record_IdSchema, body: Record_UpdateFormSchema):
         if not validation.is_valid_time(body.time):
             return { "error": "O campo \"Hora\" está inválido" }, 422
 
-        record = session.query(Record).filter(Record.id == url_parameter).first()
-
-        if not record:
-            return { "error": "Registro não encontrado no banco de dados" }, 404
-
-        record.date = str(body.date)
-        record.time = str(body.time)
-        record.value = str(body.value)
-
-        return record
+        return { "date": str(body.date), "time": str(body.time), "value": body.value }
 
     crud = CRUDFunctions()
-    return crud.update_data(body, update_function, path.record_id, "tipo de registro")
+    return crud.update_returning(body, Record, values_function, path.record_id, "registro",
+        "Registro não encontrado no banco de dados")
 
 @app.delete("/delete-record/<int:record_id>", tags=[record_tag],
         responses={ "200": Record_DeleteReturnSchema, "400": ErrorSchema })
@@ -336,8 +464,9 @@ def delete_records_date(path: Record_DateIdSchema):
     """Deleta todos os registro referentes a data passada como parâmetro
     Retorna uma mensagem de confirmação ou um erro
     """
+    # um dia pode ter muitos registros, então eles são deletados em lotes
     crud = CRUDFunctions()
-    return crud.delete_data(Record, Record.date, path.records_date, "dia")
+    return crud.delete_data(Record, Record.date, path.records_date, "dia", chunk_size=delete_chunk_size)
 
 # ------------------------------------------------------------
 # Events
@@ -347,14 +476,26 @@ event_tag = Tag(name="Eventos", description="Adição, visualização, edição
 
 @app.get("/get-events", tags=[event_tag],
         responses={ "200": Event_ListReturnSchema, "400": ErrorSchema })
-def get_events():
-    """Pesquisa por todos os eventos cadastrados
+def get_events(query: Filter_DateRangeSchema):
+    """Pesquisa por todos os eventos cadastrados, opcionalmente filtrando por período
     Retorna uma listagem dos eventos
     """
 
     def get_function(session, params):
 
-        events = session.query(Event).order_by(Event.date.desc(), Event.time.desc()).all()
+        if not validation.is_valid_date_range(params["start_date"], params["end_date"]):
+            return { "error": "O período informado está inválido" }, 422
+
+        if archive.exceeds_attach_limit(params["start_date"], params["end_date"]):
+            return { "error": "O período informado alcança mais de %d anos arquivados" % max_attached_archives }, 422
+
+        def query_function(events_source):
+            return session.query(events_source).order_by(events_source.c.date.desc(), events_source.c.time.desc()).all()
+
+        # busca os eventos do banco principal e dos arquivos dos anos que fazem parte do período
+        # (sem período, de todo o histórico)
+        events = archive.read(session, Event.__table__, query_function, params["start_date"], params["end_date"],
+            newest_first=True)
 
         data = []
         for event in events:
@@ -362,13 +503,50 @@ def get_events():
                 "id": event.id,
                 "description": event.description,
                 "date": event.date,
-                "time": event.time
+                "time": event.time,
+                "version": event.version
             })
     
         return data
     
     crud = CRUDFunctions()
-    return crud.get_data(get_function, {}, "eventos")
+    return crud.get_data(get_function, { "start_date": query.start_date, "end_date": query.end_date }, "eventos")
+
+@app.get("/search-events", tags=[event_tag],
+        responses={ "200": Event_SearchReturnSchema, "400": ErrorSchema })
+def search_events(query: Event_SearchQuerySchema):
+    """Busca os eventos cuja descrição contém as palavras informadas, opcionalmente filtrando por período
+    Retorna uma página dos eventos encontrados, ordenados por relevância
+    """
+
+    def get_function(session, params):
+
+        if not validation.is_valid_date_range(params["start_date"], params["end_date"]):
+            return { "error": "O período informado está inválido" }, 422
+
+        events, total = search.search_events(session, params["q"], params["start_date"], params["end_date"],
+            params["page"], params["page_size"])
+
+        data = []
+        for event in events:
+            data.append({
+                "id": event.id,
+                "description": event.description,
+                "date": event.date,
+                "time": event.time,
+                "rank": round(event.rank, 4)
+            })
+
+        return { "events": data, "page": params["page"], "page_size": params["page_size"], "total": total }
+
+    crud = CRUDFunctions()
+    return crud.get_data(get_function, {
+        "q": query.q,
+        "start_date": query.start_date,
+        "end_date": query.end_date,
+        "page": query.page,
+        "page_size": query.page_size
+    }, "eventos")
 
 @app.post("/add-event", tags=[event_tag],
         responses={ "200": Event_AddReturnSchema, "400": ErrorSchema })
@@ -401,7 +579,7 @@ def update_event(path: Event_IdSchema, body: Event_UpdateFormSchema):
     Retorna o objeto atualizado e uma mensagem de confirmação ou uma menasgem de erro
     """
 
-    def update_function(body, session, url_parameter):
+    def values_function(body):
 
         if not validation.is_valid_date(body.date):
             return { "error": "O campo \"Data\" está inválido" }, 422
@@ -409,18 +587,11 @@ def update_event(path: Event_IdSchema, body: Event_UpdateFormSchema):
         if not validation.is_valid_time(body.time):
             return { "error": "O campo \"Hora\" está inválido" }, 422
 
-        event = session.query(Event).filter(Event.id == url_parameter).first()
-        if not event:
-            return { "error": "Evento não encontrado no banco de dados" }, 404
-
-        event.description = str(body.description)
-        event.date = str(body.date)
-        event.time = str(body.time)
-
-        return event
+        return { "description": str(body.description), "date": str(body.date), "time": str(body.time) }
 
     crud = CRUDFunctions()
-    return crud.update_data(body, update_function, path.event_id, "evento")
+    return crud.update_returning(body, Event, values_function, path.event_id, "evento",
+        "Evento não encontrado no banco de dados")
 
 @app.delete("/delete-event/<int:event_id>", tags=[event_tag],
         responses={ "200": Event_DeleteReturnSchema, "400": ErrorSchema })
@@ -431,10 +602,235 @@ def delete_event(path: Event_IdSchema):
     crud = CRUDFunctions()
     return crud.delete_data(Event, Event.id, path.event_id, "evento")
 
+# ------------------------------------------------------------
+# Dashboard
+# ------------------------------------------------------------
+
+dashboard_tag = Tag(name="Painel", description="Visualização de todos os dados necessários para abrir a aplicação")
+
+@app.get("/dashboard", tags=[dashboard_tag],
+        responses={ "200": Dashboard_ReturnSchema, "400": ErrorSchema })
+def get_dashboard(query: Dashboard_QuerySchema):
+    """Pesquisa os tipos de registro, os agregados diários, os registros mais recentes de cada tipo e os eventos do período
+    Retorna todos os dados numa única resposta, lidos numa única transação
+    """
+
+    def get_function(session, params):
+
+        if not validation.is_valid_date_range(params["start_date"], params["end_date"]):
+            return { "error": "O período informado está inválido" }, 422
+
+        # por padrão o período são os últimos 30 dias
+        end_date = params["end_date"] or date.today().isoformat()
+        start_date = params["start_date"] or (date.fromisoformat(end_date) - timedelta(days=30)).isoformat()
+        if start_date > end_date:
+            return { "error": "O período informado está inválido" }, 422
+
+        if archive.exceeds_attach_limit(start_date, end_date):
+            return { "error": "O período informado alcança mais de %d anos arquivados" % max_attached_archives }, 422
+
+        # os arquivos do período são anexados antes de abrir a transação de leitura
+        records = archive.source(session, Record.__table__, start_date, end_date)
+        events = archive.source(session, Event.__table__, start_date, end_date)
+        crud.begin_read(session)
+
+        record_types = session.query(RecordType).order_by(RecordType.order.asc()).all()
+        record_type_names = { record_type.id: record_type.name for record_type in record_types }
+
+        # uma única leitura dos registros do período calcula os agregados diários (na primeira linha de
+        # cada dia) e numera os registros de cada tipo do mais recente para o mais antigo
+        day = (records.c.record_type_id, records.c.date)
+        windowed = session.query(
+            records,
+            func.sum(records.c.value).over(partition_by=day).label("day_total"),
+            func.avg(records.c.value).over(partition_by=day).label("day_average"),
+            func.count().over(partition_by=day).label("day_count"),
+            func.row_number().over(partition_by=day, order_by=records.c.id).label("day_row"),
+            func.row_number().over(
+                partition_by=records.c.record_type_id,
+                order_by=(records.c.date.desc(), records.c.time.desc(), records.c.id.desc())
+            ).label("latest_row")
+        ).subquery()
+
+        rows = session.query(windowed).filter(
+            or_(windowed.c.day_row == 1, windowed.c.latest_row <= params["latest"])
+        ).order_by(windowed.c.date.desc(), windowed.c.time.desc(), windowed.c.id.desc()).all()
+
+        daily_records = []
+        latest_records = []
+        for row in rows:
+            if row.day_row == 1:
+                daily_records.append({
+                    "date": row.date,
+                    "record_type_id": row.record_type_id,
+                    "record_type_name": record_type_names.get(row.record_type_id),
+                    "total_value": row.day_total,
+                    "average_value": round(row.day_average, 2) if row.day_average else 0,
+                    "count": row.day_count
+                })
+            if row.latest_row <= params["latest"]:
+                latest_records.append({
+                    "id": row.id,
+                    "date": row.date,
+                    "time": row.time,
+                    "record_type_id": row.record_type_id,
+                    "record_type_name": record_type_names.get(row.record_type_id),
+                    "value": row.value,
+                    "version": row.version
+                })
+
+        event_rows = session.query(events).order_by(events.c.date.desc(), events.c.time.desc()).all()
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "record_types": [
+                { "id": record_type.id, "name": record_type.name, "order": record_type.order, "version": record_type.version }
+                for record_type in record_types
+            ],
+            "daily_records": daily_records,
+            "latest_records": latest_records,
+            "events": [
+                {
+                    "id": event.id,
+                    "description": event.description,
+                    "date": event.date,
+                    "time": event.time,
+                    "version": event.version
+                }
+                for event in event_rows
+            ]
+        }
+
+    crud = CRUDFunctions()
+    return crud.get_data(get_function, {
+        "start_date": query.start_date,
+        "end_date": query.end_date,
+        "latest": query.latest
+    }, "dados do painel")
+
+# ------------------------------------------------------------
+# Stats
+# ------------------------------------------------------------
+
+stats_tag = Tag(name="Estatísticas", description="Visualização de estatísticas dos registros")
+
+@app.get("/stats/distribution", tags=[stats_tag],
+        responses={ "200": Stats_DistributionReturnSchema, "400": ErrorSchema })
+def get_stats_distribution(query: Stats_DistributionQuerySchema):
+    """Calcula a distribuição dos valores do tipo de registro informado a partir do histograma de valores
+    Retorna a mediana, os percentis e a quantidade de registros e dias acima do limite informado
+    """
+
+    def get_function(session, params):
+
+        for month in (params["start_month"], params["end_month"]):
+            if month is not None and not validation.is_valid_month(month):
+                return { "error": "O período informado está inválido" }, 422
+
+        record_type = session.query(RecordType).filter(RecordType.id == params["record_type_id"]).first()
+        if not record_type:
+            return { "error": "Tipo de registro não encontrado no banco de dados" }, 404
+
+        counts, day_counts = stats.histogram(session, record_type.id, params["start_month"], params["end_month"])
+
+        # os dias são contados pelo maior valor registrado no dia
+        return {
+            "record_type_id": record_type.id,
+            "total_records": sum(counts),
+            "total_days": sum(day_counts),
+            "median": stats.percentile(counts, 50),
+            "percentiles": [
+                { "percentile": percentile, "value": stats.percentile(counts, percentile) }
+                for percentile in (10, 25, 50, 75, 90)
+            ],
+            "threshold": params["threshold"],
+            "records_above_threshold": stats.above(counts, params["threshold"]),
+            "days_above_threshold": stats.above(day_counts, params["threshold"]),
+            "bucket_width": stats.bucket_value(1),
+            "buckets": counts
+        }
+
+    crud = CRUDFunctions()
+    return crud.get_data(get_function, {
+        "record_type_id": query.record_type_id,
+        "start_month": query.start_month,
+        "end_month": query.end_month,
+        "threshold": query.threshold
+    }, "estatísticas", stale_tolerant=True)
+
+@app.get("/stats/retries", tags=[stats_tag],
+        responses={ "200": Stats_RetriesReturnSchema })
+def get_stats_retries():
+    """Pesquisa os contadores de novas tentativas das escritas que encontraram o banco travado (por processo)
+    Retorna a quantidade de novas tentativas, o tempo total de espera, as escritas recuperadas e as que falharam
+    """
+    return { "data": retry_stats.to_dict() }
+
+@app.get("/stats/coalescing", tags=[stats_tag],
+        responses={ "200": Stats_CoalescingReturnSchema })
+def get_stats_coalescing():
+    """Pesquisa os contadores das leituras compartilhadas entre requisições idênticas simultâneas (por processo)
+    Retorna as requisições recebidas, as consultas executadas, as requisições atendidas por uma consulta já em andamento ou pelo cache e a proporção de requisições compartilhadas
+    """
+    return { "data": read_flights.to_dict() }
+
+@app.get("/stats/flares", tags=[stats_tag],
+        responses={ "200": Stats_FlaresReturnSchema, "400": ErrorSchema })
+def get_stats_flares(query: Stats_FlaresQuerySchema):
+    """Pesquisa os tipos de registro com anomalia ou crise em andamento e os episódios de crise mais recentes
+    O estado é mantido a cada inserção de registro, a consulta não percorre os registros
+    Retorna as anomalias atuais e os episódios de crise (abertos primeiro)
+    """
+
+    def get_function(session, params):
+
+        states = session.query(FlareState, RecordType.name).outerjoin(
+            RecordType, RecordType.id == FlareState.record_type_id
+        ).filter(or_(FlareState.anomaly == True, FlareState.open_episode_id != None)).order_by(
+            FlareState.record_type_id
+        ).all()
+
+        episodes = session.query(FlareEpisode, RecordType.name).outerjoin(
+            RecordType, RecordType.id == FlareEpisode.record_type_id
+        ).order_by(
+            FlareEpisode.end_date != None, FlareEpisode.start_date.desc(), FlareEpisode.start_time.desc()
+        ).limit(params["episodes_limit"]).all()
+
+        return {
+            "anomalies": [
+                {
+                    "record_type_id": state.record_type_id,
+                    "record_type_name": record_type_name,
+                    "count": state.count,
+                    "mean": state.mean,
+                    "std": flare.std(state),
+                    "cusum": state.cusum,
+                    "last_value": state.last_value,
+                    "last_date": state.last_date,
+                    "last_time": state.last_time,
+                    "last_z": state.last_z,
+                    "anomaly": bool(state.anomaly),
+                    "in_flare": state.open_episode_id is not None
+                }
+                for state, record_type_name in states
+            ],
+            "episodes": [
+                dict(crud.to_dict(episode), record_type_name=record_type_name)
+                for episode, record_type_name in episodes
+            ]
+        }
+
+    crud = CRUDFunctions()
+    return crud.get_data(get_function, {
+        "episodes_limit": query.episodes_limit
+    }, "episódios de crise")
+
 # ------------------------------------------------------------
 # App Run
 # -----------------------------------------------------------
 
 if __name__ == '__main__':
     init_database()
+    start_background_jobs()
     app.run(host="127.0.0.1", port=5000)
\ No newline at end of file
@@ -0,0 +1,83 @@
+import argparse
+
+from model import Session
+from functions import ArchiveFunctions, StatsFunctions, SearchFunctions, MaintenanceFunctions, FlareFunctions
+from functions.archive import archive_horizon_days
+
+# ------------------------------------------------------------
+# Comandos de manutenção do banco de dados
+# ------------------------------------------------------------
+
+def archive(args):
+    # move os dados antigos para os arquivos anuais
+    archived = ArchiveFunctions().archive_data(args.horizon_days)
+    for table_name, count in archived.items():
+        print("%s: %d linhas arquivadas" % (table_name, count))
+
+def rebuild_histogram(args):
+    # recalcula o histograma de valores a partir dos registros
+    session = Session()
+    try:
+        StatsFunctions().rebuild_histogram(session)
+        session.commit()
+        print("Histograma de valores recalculado")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def rebuild_event_search(args):
+    # recria o índice da busca textual de eventos
+    session = Session()
+    try:
+        SearchFunctions().rebuild_event_search(session)
+        session.commit()
+        print("Índice de busca de eventos recriado")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def rebuild_flares(args):
+    # recalcula as estatísticas de detecção de crises a partir de todo o histórico de registros
+    session = Session()
+    try:
+        record_types, episodes = FlareFunctions().rebuild(session)
+        session.commit()
+        print("Estado de crises recalculado: %d tipos de registro, %d episódios" % (record_types, episodes))
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def maintenance(args):
+    # executa a manutenção do banco imediatamente, sem esperar um período sem escritas
+    released = MaintenanceFunctions().run()
+    print("Manutenção concluída: %d páginas devolvidas" % released)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Comandos de manutenção do banco de dados")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = commands.add_parser("archive", help="Arquiva registros e eventos antigos em arquivos anuais")
+    archive_parser.add_argument("--horizon-days", type=int, default=archive_horizon_days,
+        help="Quantidade de dias mantidos no banco principal (padrão: %(default)s)")
+    archive_parser.set_defaults(function=archive)
+
+    histogram_parser = commands.add_parser("rebuild-histogram", help="Recalcula o histograma de valores dos registros")
+    histogram_parser.set_defaults(function=rebuild_histogram)
+
+    search_parser = commands.add_parser("rebuild-event-search", help="Recria o índice da busca textual de eventos")
+    search_parser.set_defaults(function=rebuild_event_search)
+
+    flares_parser = commands.add_parser("rebuild-flares", help="Recalcula o estado de detecção de crises dos registros")
+    flares_parser.set_defaults(function=rebuild_flares)
+
+    maintenance_parser = commands.add_parser("maintenance", help="Executa incremental_vacuum, ANALYZE e PRAGMA optimize")
+    maintenance_parser.set_defaults(function=maintenance)
+
+    args = parser.parse_args()
+    args.function(args)
\ No newline at end of file
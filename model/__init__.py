@@ -1,27 +1,41 @@
 from sqlalchemy_utils import database_exists, create_database
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy import event as sqlalchemy_event
+from contextlib import closing
 import os
+import sqlite3
+import threading
 
 from model.base import Base
 from model.record_type import RecordType
 from model.record import Record
 from model.event import Event
+from model.flare import FlareState, FlareEpisode
+from model.value_histogram import ValueHistogram, buckets_per_unit, value_histogram_triggers, value_histogram_selects, value_histogram_inserts
+from model.event_search import event_search_table, event_search_triggers, event_search_rebuild
 
 db_path = "database/"
+archive_path = db_path + "archive/"
 
-# verifica se o diretorio não existe
-if not os.path.exists(db_path):
-   # então cria o diretorio
-   os.makedirs(db_path)
+# verifica se os diretorios não existem
+for path in (db_path, archive_path):
+   if not os.path.exists(path):
+      # então cria o diretorio
+      os.makedirs(path)
 
+# arquivo do banco principal
+db_file = os.path.join(db_path, "controle_dor_db.sqlite3")
 
 # url de acesso ao banco
 db_url = 'sqlite:///%s/controle_dor_db.sqlite3' % db_path
 
+# tempo que o próprio sqlite espera por uma trava antes de falhar com "database is locked"; curto para que
+# as esperas mais longas fiquem com a política de novas tentativas (functions/retry.py), que as contabiliza
+sqlite_busy_timeout_seconds = float(os.environ.get("SQLITE_BUSY_TIMEOUT_SECONDS", 0.1))
+
 # cria a engine de conexão com o banco
-engine = create_engine(db_url)
+engine = create_engine(db_url, connect_args={ "timeout": sqlite_busy_timeout_seconds })
 
 # configuração de foreign key constraints
 @sqlalchemy_event.listens_for(engine, "connect")
@@ -33,9 +47,131 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 # instancia um criador de seção com o banco
 Session = sessionmaker(bind=engine)
 
+# cópia somente leitura do banco, atualizada periodicamente, usada nas consultas que toleram dados defasados
+snapshot_file = os.path.join(db_path, "controle_dor_snapshot.sqlite3")
+snapshot_url = 'sqlite:///file:%s?mode=ro&uri=true' % snapshot_file
+
+# cria a engine de conexão com a cópia e o criador de seção correspondente
+snapshot_engine = create_engine(snapshot_url)
+SnapshotSession = sessionmaker(bind=snapshot_engine)
+
+# descritor do banco principal usado para ler o contador de alterações: é aberto uma única vez e mantido aberto
+# durante toda a vida do processo, porque fechar qualquer descritor do arquivo libera todas as travas (fcntl) que
+# as conexões do sqlite deste processo mantêm nele, inclusive as de outras threads no meio de uma transação
+_data_version_fd = None
+_data_version_lock = threading.Lock()
+
+def data_version():
+    """ Retorna o contador de alterações do cabeçalho do banco principal (ou None se o arquivo não existe)
+    O contador muda a cada commit feito por qualquer processo, então identifica a versão dos dados
+    """
+    global _data_version_fd
+    if _data_version_fd is None:
+        with _data_version_lock:
+            if _data_version_fd is None:
+                try:
+                    _data_version_fd = os.open(db_file, os.O_RDONLY)
+                except FileNotFoundError:
+                    return None
+    # leitura posicional, sem alterar o descritor compartilhado entre as threads
+    return int.from_bytes(os.pread(_data_version_fd, 4, 24), "big")
+
+def snapshot_version():
+    """ Retorna a versão da cópia somente leitura (ou None se ela não existe), sem abrir o arquivo
+    A cópia nunca é alterada, apenas substituída por outro arquivo, então o inode e a data de modificação a identificam
+    """
+    try:
+        stat = os.stat(snapshot_file)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
 # cria o banco se ele não existir 
 if not database_exists(engine.url):
     create_database(engine.url) 
 
 # cria as tabelas do banco, caso não existam
-Base.metadata.create_all(engine)
\ No newline at end of file
+Base.metadata.create_all(engine)
+
+# adiciona a coluna de versão (controle de concorrência otimista) nas tabelas criadas antes dela
+with engine.begin() as connection:
+    for table in (RecordType.__table__, Record.__table__, Event.__table__):
+        columns = [row[1] for row in connection.execute(text("PRAGMA table_info(%s)" % table.name)).all()]
+        if "version" not in columns:
+            connection.execute(text("ALTER TABLE %s ADD COLUMN version INTEGER NOT NULL DEFAULT 1" % table.name))
+
+# recria com AUTOINCREMENT as tabelas arquivadas criadas antes dele: o sqlite passa a guardar o maior id já usado
+# (sqlite_sequence), e um id de uma linha arquivada não é reutilizado mesmo que o banco principal fique vazio
+def archived_max_id(table_name):
+    # maior id da tabela entre os arquivos de arquivamento
+    max_id = 0
+    for file_name in os.listdir(archive_path):
+        if not file_name.endswith(".sqlite3"):
+            continue
+        try:
+            file = os.path.join(archive_path, file_name)
+            with closing(sqlite3.connect("file:%s?mode=ro" % file, uri=True)) as connection:
+                max_id = max(max_id, connection.execute("SELECT MAX(id) FROM %s" % table_name).fetchone()[0] or 0)
+        except sqlite3.DatabaseError:
+            pass
+    return max_id
+
+with engine.begin() as connection:
+    quote = connection.dialect.identifier_preparer.quote
+    for table in (Record.__table__, Event.__table__):
+        sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), { "name": table.name }).scalar()
+        if "AUTOINCREMENT" in sql.upper():
+            continue
+        triggers = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :name"), { "name": table.name }
+        ).scalars().all()
+        # a tabela antiga é renomeada (levando junto as suas triggers) e os dados são copiados com os mesmos ids
+        old_name = "_%s_old" % table.name
+        connection.execute(text("ALTER TABLE %s RENAME TO %s" % (quote(table.name), quote(old_name))))
+        for index in table.indexes:
+            connection.execute(text("DROP INDEX IF EXISTS %s" % quote(index.name)))
+        table.create(connection)
+        columns = ", ".join(quote(c.name) for c in table.columns)
+        connection.execute(text("INSERT INTO %s (%s) SELECT %s FROM %s" % (quote(table.name), columns, columns, quote(old_name))))
+        connection.execute(text("DROP TABLE %s" % quote(old_name)))
+        # as triggers existentes são recriadas como estavam logo após a cópia (o histograma e o índice de busca
+        # continuam válidos; triggers desatualizadas são tratadas a seguir)
+        for trigger in triggers:
+            connection.execute(text(trigger))
+        # o maior id usado considera também as linhas que já estão nos arquivos
+        last_id = max(connection.execute(text("SELECT MAX(id) FROM %s" % quote(table.name))).scalar() or 0, archived_max_id(table.name))
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), { "name": table.name })
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), { "name": table.name, "seq": last_id })
+
+# migra o banco para auto_vacuum incremental, permitindo que as páginas liberadas pelas deleções
+# sejam devolvidas aos poucos pela manutenção (a mudança só vale após um VACUUM completo)
+with closing(sqlite3.connect(db_file, isolation_level=None)) as connection:
+    if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("VACUUM")
+
+# cria as triggers que mantêm o histograma de valores e a busca de eventos atualizados
+with engine.begin() as connection:
+    # cria os índices adicionados a tabelas já existentes
+    for index in Record.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    existing_triggers = dict(connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all())
+    # o sqlite guarda o comando de criação da trigger sem o IF NOT EXISTS
+    expected_triggers = [trigger.replace("IF NOT EXISTS ", "", 1) for trigger in value_histogram_triggers]
+    if any(trigger not in existing_triggers.values() for trigger in expected_triggers):
+        # banco criado antes do histograma (ou com buckets de outro tamanho): as triggers antigas são removidas e
+        # as contagens dos registros já existentes (inclusive os arquivados) são carregadas na inicialização
+        # da aplicação, que encontra o histograma vazio
+        for name in existing_triggers:
+            if name.startswith("value_histogram_"):
+                connection.execute(text("DROP TRIGGER %s" % name))
+        connection.execute(ValueHistogram.__table__.delete())
+    for trigger in value_histogram_triggers:
+        connection.execute(text(trigger))
+
+    connection.execute(text(event_search_table))
+    if "events_fts_after_insert" not in existing_triggers:
+        # banco criado antes da busca de eventos: indexa os eventos já existentes
+        connection.execute(text(event_search_rebuild))
+    for trigger in event_search_triggers:
+        connection.execute(text(trigger))
\ No newline at end of file
@@ -3,11 +3,15 @@ from model.base import Base
 
 class Event(Base):
     __tablename__ = "events"
+    # AUTOINCREMENT: os ids das linhas arquivadas nunca são reutilizados
+    __table_args__ = { "sqlite_autoincrement": True }
 
     id = Column(Integer, primary_key=True)
     description = Column(String(255))
     date = Column(String(9))
     time = Column(String(12))
+    # incrementada a cada atualização, usada no controle de concorrência otimista
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     def __init__(self, description:str, date:str, time:str):
         self.description = description
@@ -0,0 +1,26 @@
+# ------------------------------------------------------------
+# Busca textual nas descrições dos eventos (FTS5)
+# ------------------------------------------------------------
+
+# tabela virtual que indexa a descrição dos eventos sem duplicar o conteúdo (external content)
+event_search_table = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        description, content='events', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )"""
+
+# triggers que mantêm o índice sincronizado com a tabela de eventos
+event_search_triggers = [
+    """CREATE TRIGGER IF NOT EXISTS events_fts_after_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_after_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts (events_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_after_update AFTER UPDATE ON events BEGIN
+        INSERT INTO events_fts (events_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        INSERT INTO events_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END""",
+]
+
+# recria todo o índice a partir da tabela de eventos
+event_search_rebuild = "INSERT INTO events_fts (events_fts) VALUES ('rebuild')"
\ No newline at end of file
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean
+from model.base import Base
+
+class FlareState(Base):
+    __tablename__ = "flare_state"
+
+    # estatísticas online dos valores de um tipo de registro, atualizadas a cada inserção
+    record_type_id = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0)
+    # média e variância móveis exponenciais (EWMA)
+    mean = Column(Float, default=0)
+    variance = Column(Float, default=0)
+    # soma acumulada (CUSUM) dos desvios padronizados acima da média
+    cusum = Column(Float, default=0)
+    # último valor recebido e o seu desvio padronizado em relação à média anterior
+    last_value = Column(Float)
+    last_date = Column(String(9))
+    last_time = Column(String(12))
+    last_z = Column(Float)
+    anomaly = Column(Boolean, default=False)
+    # episódio de crise em andamento, se houver
+    open_episode_id = Column(Integer)
+
+    def __init__(self, record_type_id:int):
+        self.record_type_id = record_type_id
+        self.count = 0
+        self.mean = 0
+        self.variance = 0
+        self.cusum = 0
+        self.anomaly = False
+
+class FlareEpisode(Base):
+    __tablename__ = "flare_episodes"
+
+    # período em que o CUSUM de um tipo de registro ficou acima do limite (crise)
+    id = Column(Integer, primary_key=True)
+    record_type_id = Column(Integer)
+    start_date = Column(String(9))
+    start_time = Column(String(12))
+    end_date = Column(String(9))
+    end_time = Column(String(12))
+    peak_value = Column(Float)
+    peak_cusum = Column(Float)
+
+    def __init__(self, record_type_id:int, start_date:str, start_time:str, peak_value:float, peak_cusum:float):
+        self.record_type_id = record_type_id
+        self.start_date = start_date
+        self.start_time = start_time
+        self.peak_value = peak_value
+        self.peak_cusum = peak_cusum
\ No newline at end of file
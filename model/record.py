@@ -1,16 +1,21 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from model.base import Base
 from model.record_type import RecordType
 
 class Record(Base):
     __tablename__ = "records"
+    # índice usado pelas triggers do histograma para recalcular o maior valor do dia
+    # (AUTOINCREMENT: os ids das linhas arquivadas nunca são reutilizados)
+    __table_args__ = (Index("ix_records_record_type_id_date", "record_type_id", "date"), { "sqlite_autoincrement": True })
 
     id = Column(Integer, primary_key=True)
     record_type_id = Column(Integer, ForeignKey("record_type.id"))
     date = Column(String(9))
     time = Column(String(12))
     value = Column(Integer)
+    # incrementada a cada atualização, usada no controle de concorrência otimista
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     record_type = relationship("RecordType", back_populates="records")
 
@@ -8,6 +8,8 @@ class RecordType(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100))
     order = Column(Integer)
+    # incrementada a cada atualização, usada no controle de concorrência otimista
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     records = relationship("Record", back_populates="record_type")
 
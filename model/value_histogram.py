@@ -0,0 +1,124 @@
+from sqlalchemy import Column, Integer, String, select, func, literal, cast
+from sqlalchemy.dialects.sqlite import insert
+from model.base import Base
+
+# os valores são contados em décimos: o bucket 74 conta os registros de valor 7.4 (0 a 100)
+buckets_per_unit = 10
+
+class ValueHistogram(Base):
+    __tablename__ = "value_histogram"
+
+    # contagens por tipo de registro, mês ("2025-06") e valor em décimos (0 a 100)
+    record_type_id = Column(Integer, primary_key=True)
+    month = Column(String(7), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    # quantidade de registros com o valor
+    count = Column(Integer, default=0)
+    # quantidade de dias cujo maior valor registrado é o valor
+    day_count = Column(Integer, default=0)
+
+    def __init__(self, record_type_id:int, month:str, bucket:int, count:int=0, day_count:int=0):
+        self.record_type_id = record_type_id
+        self.month = month
+        self.bucket = bucket
+        self.count = count
+        self.day_count = day_count
+
+# ------------------------------------------------------------
+# Manutenção incremental (triggers)
+# ------------------------------------------------------------
+
+# soma delta na contagem de registros do valor da linha
+_value_sql = """
+    INSERT INTO value_histogram (record_type_id, month, bucket, count, day_count)
+    VALUES ({row}.record_type_id, substr({row}.date, 1, 7), CAST(ROUND({row}.value * %d) AS INTEGER), {delta}, 0)
+    ON CONFLICT (record_type_id, month, bucket) DO UPDATE SET count = count + {delta};""" % buckets_per_unit
+
+# soma delta na contagem de dias do maior valor atual do dia da linha
+_day_peak_sql = """
+    INSERT INTO value_histogram (record_type_id, month, bucket, count, day_count)
+    SELECT {row}.record_type_id, substr({row}.date, 1, 7), CAST(ROUND(MAX(value) * %d) AS INTEGER), 0, {delta}
+    FROM records WHERE record_type_id = {row}.record_type_id AND date = {row}.date {condition}
+    HAVING COUNT(*) > 0
+    ON CONFLICT (record_type_id, month, bucket) DO UPDATE SET day_count = day_count + {delta};""" % buckets_per_unit
+
+# em updates o dia novo só é tratado separadamente quando é diferente do antigo
+_day_changed = "AND (NEW.date <> OLD.date OR NEW.record_type_id <> OLD.record_type_id)"
+
+def _trigger(name, moment, statements):
+    return "CREATE TRIGGER IF NOT EXISTS %s %s ON records BEGIN%s\nEND" % (name, moment, "".join(statements))
+
+# o maior valor do dia é retirado antes da alteração e recalculado depois dela
+value_histogram_triggers = [
+    _trigger("value_histogram_before_insert", "BEFORE INSERT", [
+        _day_peak_sql.format(row="NEW", delta=-1, condition="")
+    ]),
+    _trigger("value_histogram_after_insert", "AFTER INSERT", [
+        _value_sql.format(row="NEW", delta=1),
+        _day_peak_sql.format(row="NEW", delta=1, condition="")
+    ]),
+    _trigger("value_histogram_before_update", "BEFORE UPDATE", [
+        _day_peak_sql.format(row="OLD", delta=-1, condition=""),
+        _day_peak_sql.format(row="NEW", delta=-1, condition=_day_changed)
+    ]),
+    _trigger("value_histogram_after_update", "AFTER UPDATE", [
+        _value_sql.format(row="OLD", delta=-1),
+        _value_sql.format(row="NEW", delta=1),
+        _day_peak_sql.format(row="OLD", delta=1, condition=""),
+        _day_peak_sql.format(row="NEW", delta=1, condition=_day_changed)
+    ]),
+    _trigger("value_histogram_before_delete", "BEFORE DELETE", [
+        _day_peak_sql.format(row="OLD", delta=-1, condition="")
+    ]),
+    _trigger("value_histogram_after_delete", "AFTER DELETE", [
+        _value_sql.format(row="OLD", delta=-1),
+        _day_peak_sql.format(row="OLD", delta=1, condition="")
+    ]),
+]
+
+# ------------------------------------------------------------
+# Carga a partir de um conjunto de registros
+# ------------------------------------------------------------
+
+def _bucket(value):
+    return cast(func.round(value * buckets_per_unit), Integer)
+
+def value_histogram_selects(records):
+    """ Retorna as consultas das contagens de registros e de dias dos registros da origem informada
+    (uma tabela ou subquery com as colunas record_type_id, date e value), ambas com as colunas
+    record_type_id, month, bucket, count e day_count
+    """
+    month = func.substr(records.c.date, 1, 7)
+
+    value_counts = select(
+        records.c.record_type_id, month, _bucket(records.c.value), func.count(), literal(0)
+    ).group_by(records.c.record_type_id, month, _bucket(records.c.value))
+
+    daily_peaks = select(
+        records.c.record_type_id, records.c.date, func.max(records.c.value).label("peak")
+    ).group_by(records.c.record_type_id, records.c.date).subquery()
+    peak_month = func.substr(daily_peaks.c.date, 1, 7)
+
+    day_counts = select(
+        daily_peaks.c.record_type_id, peak_month, _bucket(daily_peaks.c.peak), literal(0), func.count()
+    ).group_by(daily_peaks.c.record_type_id, peak_month, _bucket(daily_peaks.c.peak))
+
+    return [value_counts, day_counts]
+
+def value_histogram_inserts(records):
+    """ Retorna os comandos que somam no histograma os registros da origem informada
+    (uma tabela ou subquery com as colunas record_type_id, date e value)
+    """
+    table = ValueHistogram.__table__
+    columns = ["record_type_id", "month", "bucket", "count", "day_count"]
+    statements = []
+    for counts in value_histogram_selects(records):
+        statement = insert(table).from_select(columns, counts)
+        statements.append(statement.on_conflict_do_update(
+            index_elements=["record_type_id", "month", "bucket"],
+            set_={
+                "count": table.c.count + statement.excluded.count,
+                "day_count": table.c.day_count + statement.excluded.day_count
+            }
+        ))
+    return statements
\ No newline at end of file
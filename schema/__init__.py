@@ -1,4 +1,7 @@
 from schema.record_type import *
 from schema.record import *
 from schema.event import *
+from schema.filter import *
+from schema.stats import *
+from schema.dashboard import *
 from schema.error import *
\ No newline at end of file
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+from schema.record_type import RecordType_ViewSchema
+from schema.record import Record_ViewBasicSchema
+from schema.event import Event_ViewSchema
+
+# --------------
+# Views Schema
+
+class Dashboard_QuerySchema(BaseModel):
+    """ Define os parâmetros do painel: o período (por padrão os últimos 30 dias) e a quantidade de
+    registros mais recentes retornados por tipo de registro
+    """
+    start_date: Optional[str] = Field(None, example="2025-06-01")
+    end_date: Optional[str] = Field(None, example="2025-06-30")
+    latest: int = Field(5, example=5, ge=0, le=50)
+
+class Dashboard_DailyRecordSchema(BaseModel):
+    """ Define a estrutura de retorno do agregado diário de um tipo de registro
+    """
+    date: str = "2025-06-07"
+    record_type_id: int = 1
+    record_type_name: str = "Dor"
+    total_value: float = 21
+    average_value: float = 10.5
+    count: int = 2
+
+class Dashboard_ViewSchema(BaseModel):
+    """ Define a estrutura de retorno do painel
+    """
+    start_date: str = "2025-06-01"
+    end_date: str = "2025-06-30"
+    record_types: List[RecordType_ViewSchema]
+    daily_records: List[Dashboard_DailyRecordSchema]
+    latest_records: List[Record_ViewBasicSchema]
+    events: List[Event_ViewSchema]
+
+class Dashboard_ReturnSchema(BaseModel):
+    """ Define como o painel será retornado
+    """
+    data: Dashboard_ViewSchema
\ No newline at end of file
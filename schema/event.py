@@ -11,12 +11,47 @@ class Event_ViewSchema(BaseModel):
     description: str = "Descrição do evento"
     date: str = "2025-12-17"
     time: str = "09:36"
+    version: Optional[int] = 1
 
 class Event_ListReturnSchema(BaseModel):
     """ Define como a listagem de eventos será retornada
     """
     data: List[Event_ViewSchema]
 
+# --------------
+# Search Schema
+
+class Event_SearchQuerySchema(BaseModel):
+    """ Define os parâmetros da busca textual de eventos
+    """
+    q: str = Field(..., example="remédio")
+    start_date: Optional[str] = Field(None, example="2025-01-01")
+    end_date: Optional[str] = Field(None, example="2025-12-31")
+    page: int = Field(1, example=1, ge=1)
+    page_size: int = Field(20, example=20, ge=1, le=100)
+
+class Event_SearchViewSchema(BaseModel):
+    """ Define a estrutura de retorno de um evento encontrado na busca
+    """
+    id: int = 1
+    description: str = "Tomei o remédio"
+    date: str = "2025-12-17"
+    time: str = "09:36"
+    rank: float = -1.2
+
+class Event_SearchResultSchema(BaseModel):
+    """ Define a estrutura de uma página do resultado da busca de eventos
+    """
+    events: List[Event_SearchViewSchema]
+    page: int = 1
+    page_size: int = 20
+    total: int = 1
+
+class Event_SearchReturnSchema(BaseModel):
+    """ Define como o resultado da busca de eventos será retornado
+    """
+    data: Event_SearchResultSchema
+
 # --------------
 # Add Schema
 
@@ -47,6 +82,7 @@ class Event_UpdateFormSchema(BaseModel):
     description: str = Field(..., example="Nova descrição")
     date: str = Field(..., example="2025-12-17")
     time: str = Field(..., example="09:36")
+    version: Optional[int] = Field(None, example=1, description="Versão lida pelo cliente; se informada, a atualização só é feita se o evento não foi alterado desde então")
 
 class Event_UpdateReturnSchema(BaseModel):
     """ Define a estrutura de retorno após a atualização de um evento
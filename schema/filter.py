@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# --------------
+# Filter Schema
+
+class Filter_DateRangeSchema(BaseModel):
+    """ Define os parâmetros opcionais de período para filtrar as listagens
+    """
+    start_date: Optional[str] = Field(None, example="2025-01-01")
+    end_date: Optional[str] = Field(None, example="2025-12-31")
+
+class Filter_StaleDateRangeSchema(Filter_DateRangeSchema):
+    """ Define os parâmetros opcionais de período das listagens que podem ser respondidas pela cópia somente leitura
+    """
+    stale_ok: bool = Field(False, example=False, description="Aceita dados com alguns minutos de defasagem (cópia somente leitura); não use para confirmar uma escrita recém-feita")
\ No newline at end of file
@@ -13,6 +13,7 @@ class Record_ViewBasicSchema(BaseModel):
     record_type_id: int = 1
     record_type_name: str = "Dor"
     value: float = 6
+    version: Optional[int] = 1
 
 class Record_ViewCompleteSchema(BaseModel):
     """ Define a estrutura mais completa de retorno de um registro  (com nome do tipo de registro, valor total do registro no dia e média do registro no dia incluso)
@@ -33,6 +34,7 @@ class Record_ViewReturnSchema(BaseModel):
     time: str = "10:05"
     record_type_id: int = 1
     value: float = 6
+    version: int = 1
 
 class Record_ListBasicReturnSchema(BaseModel):
     """ Define como a listagem básica de registros será retornada
@@ -80,6 +82,43 @@ class Record_AddBatchReturnSchema(BaseModel):
     data: List[Record_AddFormSchema]
     message: str
 
+class Record_AddTimedBatchInnerFormSchema(BaseModel):
+    """ Define como um registro deve ser estruturado para a inserção em lote com data e hora por registro
+    """
+    record_type_id: int = Field(..., example=1)
+    date: str = Field(..., example="2025-06-07")
+    time: str = Field(..., example="10:05")
+    value: float = Field(..., example=7, ge=0, le=10)
+
+class Record_AddTimedBatchFormSchema(BaseModel):
+    """ Define como deve ser a estrutura para a inserção em lote de registros com datas e horas diferentes
+    """
+    batch_records: List[Record_AddTimedBatchInnerFormSchema]
+
+class Record_BatchItemViewSchema(BaseModel):
+    """ Define a estrutura de retorno de um registro inserido em lote (com a posição do item no lote)
+    """
+    index: int = 0
+    id: int = 1
+    date: str = "2025-06-07"
+    time: str = "10:05"
+    record_type_id: int = 1
+    value: float = 6
+    version: int = 1
+
+class Record_BatchItemErrorSchema(BaseModel):
+    """ Define a estrutura de retorno do erro de um item do lote
+    """
+    index: int = 1
+    error: str = "Tipo de registro não encontrado no banco de dados"
+
+class Record_AddTimedBatchReturnSchema(BaseModel):
+    """ Define a estrutura de retorno após a inserção em lote com data e hora por registro
+    """
+    data: List[Record_BatchItemViewSchema]
+    errors: List[Record_BatchItemErrorSchema]
+    message: str
+
 # --------------
 # Update Schema
 
@@ -94,6 +133,7 @@ class Record_UpdateFormSchema(BaseModel):
     date: str = Field(..., example="2025-06-07")
     time: str = Field(..., example="10:05")
     value: float = Field(..., example=6, ge=0, le=10)
+    version: Optional[int] = Field(None, example=1, description="Versão lida pelo cliente; se informada, a atualização só é feita se o registro não foi alterado desde então")
 
 class Record_UpdateReturnSchema(BaseModel):
     """ Define a estrutura de retorno após a atualização de um registro
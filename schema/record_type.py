@@ -10,6 +10,7 @@ class RecordType_ViewSchema(BaseModel):
     id: int = 1
     name: str = "Dor"
     order: int = 1
+    version: int = 1
 
 class RecordType_ListReturnSchema(BaseModel):
     """ Define como a listagem de tipos de registro será retornada
@@ -42,6 +43,7 @@ class RecordType_UpdateFormSchema(BaseModel):
     """ Define como um tipo de registro a ser atulizado deve ser estruturado
     """
     name: str = Field(..., example="Novo nome")
+    version: Optional[int] = Field(None, example=1, description="Versão lida pelo cliente; se informada, a atualização só é feita se o tipo de registro não foi alterado desde então")
 
 class RecordType_UpdateReturnSchema(BaseModel):
     """ Define a estrutura de retorno após a atualização de um tipo de registro
@@ -54,6 +56,7 @@ class RecordType_UpdateOrderInnerFormSchema(BaseModel):
     """
     id: int = Field(..., example=1)
     order: int = Field(..., example=1)
+    version: Optional[int] = Field(None, example=1, description="Versão lida pelo cliente; se informada, a ordenação só é atualizada se o tipo de registro não foi alterado desde então")
 
 class RecordType_UpdateOrderFormSchema(BaseModel):
     """ Define como deve ser a estrutura para a atualização da ordenação dos tipos de registro
@@ -0,0 +1,119 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+# --------------
+# Distribution Schema
+
+class Stats_DistributionQuerySchema(BaseModel):
+    """ Define os parâmetros da consulta da distribuição de valores de um tipo de registro
+    """
+    record_type_id: int = Field(..., example=1)
+    start_month: Optional[str] = Field(None, example="2025-01")
+    end_month: Optional[str] = Field(None, example="2025-12")
+    threshold: float = Field(7, example=7, ge=0, le=10)
+
+class Stats_PercentileSchema(BaseModel):
+    """ Define a estrutura de retorno de um percentil
+    """
+    percentile: int = 90
+    value: Optional[float] = 8.5
+
+class Stats_DistributionViewSchema(BaseModel):
+    """ Define a estrutura de retorno da distribuição de valores de um tipo de registro
+    """
+    record_type_id: int = 1
+    total_records: int = 120
+    total_days: int = 45
+    median: Optional[float] = 5.5
+    percentiles: List[Stats_PercentileSchema]
+    threshold: float = 7
+    records_above_threshold: int = 30
+    days_above_threshold: int = 12
+    bucket_width: float = 0.1
+    buckets: List[int] = Field(..., description="Quantidade de registros de cada valor em décimos: o índice 74 conta os registros de valor 7.4 (101 posições, de 0 a 10)")
+
+class Stats_DistributionReturnSchema(BaseModel):
+    """ Define como a distribuição de valores será retornada
+    """
+    data: Stats_DistributionViewSchema
+
+# --------------
+# Retries Schema
+
+class Stats_RetriesViewSchema(BaseModel):
+    """ Define a estrutura de retorno dos contadores de novas tentativas por trava do banco
+    """
+    retries: int = 12
+    wait_seconds: float = 0.35
+    recovered: int = 9
+    failures: int = 0
+
+class Stats_RetriesReturnSchema(BaseModel):
+    """ Define como os contadores de novas tentativas serão retornados
+    """
+    data: Stats_RetriesViewSchema
+
+# --------------
+# Coalescing Schema
+
+class Stats_CoalescingViewSchema(BaseModel):
+    """ Define a estrutura de retorno dos contadores das leituras compartilhadas
+    """
+    requests: int = 1000
+    executions: int = 150
+    coalesced: int = 700
+    cache_hits: int = 150
+    coalescing_ratio: float = 0.85
+
+class Stats_CoalescingReturnSchema(BaseModel):
+    """ Define como os contadores das leituras compartilhadas serão retornados
+    """
+    data: Stats_CoalescingViewSchema
+
+# --------------
+# Flares Schema
+
+class Stats_FlaresQuerySchema(BaseModel):
+    """ Define os parâmetros da consulta das anomalias e dos episódios de crise
+    """
+    episodes_limit: int = Field(20, example=20, ge=1, le=200)
+
+class Stats_FlareStateSchema(BaseModel):
+    """ Define a estrutura de retorno do estado atual de um tipo de registro
+    """
+    record_type_id: int = 1
+    record_type_name: Optional[str] = "Dor"
+    count: int = 120
+    mean: float = 4.2
+    std: float = 1.1
+    cusum: float = 5.3
+    last_value: Optional[float] = 9
+    last_date: Optional[str] = "2025-06-07"
+    last_time: Optional[str] = "10:05"
+    last_z: Optional[float] = 3.2
+    anomaly: bool = True
+    in_flare: bool = True
+
+class Stats_FlareEpisodeSchema(BaseModel):
+    """ Define a estrutura de retorno de um episódio de crise
+    """
+    id: int = 1
+    record_type_id: int = 1
+    record_type_name: Optional[str] = "Dor"
+    start_date: str = "2025-06-05"
+    start_time: str = "08:00"
+    end_date: Optional[str] = None
+    end_time: Optional[str] = None
+    peak_value: float = 9
+    peak_cusum: float = 7.8
+
+class Stats_FlaresViewSchema(BaseModel):
+    """ Define a estrutura de retorno das anomalias e dos episódios de crise
+    """
+    anomalies: List[Stats_FlareStateSchema]
+    episodes: List[Stats_FlareEpisodeSchema]
+
+class Stats_FlaresReturnSchema(BaseModel):
+    """ Define como as anomalias e os episódios de crise serão retornados
+    """
+    data: Stats_FlaresViewSchema
\ No newline at end of file
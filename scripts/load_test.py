@@ -0,0 +1,74 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# ------------------------------------------------------------
+# Teste de carga
+# ------------------------------------------------------------
+# Dispara requisições concorrentes contra um servidor já em execução e mede a vazão.
+# Exemplo (ver README): python scripts/load_test.py --url http://127.0.0.1:5000 --write-ratio 0.1
+
+def request(url, method="GET", body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={ "Content-Type": "application/json" })
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def run(args):
+    counter = { "requests": 0 }
+    counter_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+
+    def worker(index):
+        deadline = time.perf_counter() + args.duration
+        local_latencies = []
+        local_statuses = {}
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            start = time.perf_counter()
+            # uma fração das requisições são escritas de registros, o resto são leituras
+            if args.write_ratio and i % round(1 / args.write_ratio) == 0:
+                status = request(args.url + "/add-record", "POST", {
+                    "record_type_id": 1, "date": "2025-06-07", "time": "10:05", "value": i % 11
+                })
+            else:
+                status = request(args.url + args.path)
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with counter_lock:
+            counter["requests"] += len(local_latencies)
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print("requisições:   %d em %.1fs" % (counter["requests"], elapsed))
+    print("vazão:         %.1f req/s" % (counter["requests"] / elapsed))
+    if latencies:
+        print("latência p50:  %.1f ms" % (statistics.median(latencies) * 1000))
+        print("latência p95:  %.1f ms" % (latencies[int(len(latencies) * 0.95) - 1] * 1000))
+    print("status:        %s" % dict(sorted(statuses.items())))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teste de carga da API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--path", default="/get-records-by-record-type/1", help="rota consultada nas leituras")
+    parser.add_argument("--concurrency", type=int, default=16, help="clientes simultâneos")
+    parser.add_argument("--duration", type=float, default=20, help="duração em segundos")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="fração de requisições de escrita (0 a 1)")
+    run(parser.parse_args())
\ No newline at end of file
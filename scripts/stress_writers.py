@@ -0,0 +1,129 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+# ------------------------------------------------------------
+# Teste de estresse de escritas concorrentes
+# ------------------------------------------------------------
+# Vários processos escrevem ao mesmo tempo no mesmo banco sqlite (criado numa pasta temporária)
+# através das rotas da aplicação, enquanto outros processos leem. Cada processo executa várias
+# threads, como os workers gthread do gunicorn: nos processos escritores, threads escrevendo e
+# threads lendo usam conexões diferentes do mesmo processo ao mesmo tempo.
+# Nenhuma escrita ou leitura pode terminar com erro.
+# Exemplo (ver README): python scripts/stress_writers.py --processes 4 --writes 50 --readers 2 --threads 4
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def count(statuses, status):
+    statuses[status] = statuses.get(status, 0) + 1
+
+def write(client, index, writes, statuses):
+    # cada thread usa a sua própria data, para que as deleções não removam registros de outra thread
+    records_date = "2025-%02d-%02d" % (index % 12 + 1, index // 12 + 1)
+    for i in range(writes):
+        # alterna inserções, edições e deleções de registros e eventos
+        if i % 4 == 3:
+            response = client.delete("/delete-records-date/" + records_date)
+        elif i % 4 == 2:
+            response = client.post("/add-event", json={ "description": "evento %d" % i, "date": "2025-06-07", "time": "10:05" })
+        else:
+            response = client.post("/add-record", json={
+                "record_type_id": 1, "date": records_date, "time": "10:05", "value": i % 11
+            })
+        count(statuses, response.status_code)
+
+def read(client, reads, statuses):
+    for i in range(reads):
+        # alterna as listagens de registros e de eventos
+        if i % 3 == 2:
+            response = client.get("/get-events")
+        elif i % 3 == 1:
+            response = client.get("/get-records")
+        else:
+            response = client.get("/get-records-by-record-type/1")
+        count(statuses, response.status_code)
+
+def worker(index, writes, reads, threads, results):
+    """ Processo com várias threads, como os workers gthread do gunicorn: threads escrevendo e threads lendo
+    ao mesmo tempo, cada uma com o seu cliente, para que conexões de threads diferentes do mesmo processo se misturem
+    """
+    import threading
+    import main
+    from functions.retry import retry_stats
+
+    write_statuses = {}
+    read_statuses = {}
+
+    def run(function, statuses, *args):
+        try:
+            function(main.app.test_client(), *args, statuses)
+        except Exception as e:
+            # uma thread interrompida por uma exceção conta como uma requisição com erro
+            print(repr(e))
+            count(statuses, "exceção")
+
+    clients = []
+    for thread in range(threads):
+        if writes:
+            clients.append(threading.Thread(target=run, args=(write, write_statuses, index * threads + thread, writes)))
+        if reads:
+            clients.append(threading.Thread(target=run, args=(read, read_statuses, reads)))
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    results.put((write_statuses, read_statuses, retry_stats.to_dict()))
+
+def summarize(collected):
+    # soma os status e os contadores de novas tentativas dos processos
+    write_statuses = {}
+    read_statuses = {}
+    stats = { "retries": 0, "wait_seconds": 0.0, "recovered": 0, "failures": 0 }
+    for process_writes, process_reads, process_stats in collected:
+        for statuses, process_statuses in ((write_statuses, process_writes), (read_statuses, process_reads)):
+            for status, total in process_statuses.items():
+                statuses[status] = statuses.get(status, 0) + total
+        for key in stats:
+            stats[key] += process_stats[key]
+    return write_statuses, read_statuses, stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teste de estresse de escritas concorrentes")
+    parser.add_argument("--processes", type=int, default=4, help="processos escrevendo (e lendo) ao mesmo tempo")
+    parser.add_argument("--writes", type=int, default=50, help="escritas por thread escritora")
+    parser.add_argument("--readers", type=int, default=2, help="processos apenas lendo ao mesmo tempo")
+    parser.add_argument("--reads", type=int, default=100, help="leituras por thread leitora")
+    parser.add_argument("--threads", type=int, default=4, help="threads escrevendo e threads lendo em cada processo")
+    args = parser.parse_args()
+
+    # o banco do teste fica numa pasta temporária, sem tocar no banco da aplicação
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, root_path)
+    import main
+    main.init_database()
+
+    # os processos escritores também leem (em outras threads); os processos leitores apenas leem
+    results = Queue()
+    processes = [Process(target=worker, args=(index, args.writes, args.reads, args.threads, results)) for index in range(args.processes)]
+    processes += [Process(target=worker, args=(args.processes + index, 0, args.reads, args.threads, results)) for index in range(args.readers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for process in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    write_statuses, read_statuses, stats = summarize(collected)
+
+    print("escritas:      %d em %.1fs" % (sum(write_statuses.values()), elapsed))
+    print("status:        %s" % dict(sorted(write_statuses.items(), key=str)))
+    print("leituras:      %d" % sum(read_statuses.values()))
+    print("status:        %s" % dict(sorted(read_statuses.items(), key=str)))
+    print("novas tentativas: %(retries)d (espera total %(wait_seconds).2fs), recuperadas: %(recovered)d, falhas: %(failures)d" % stats)
+
+    # qualquer status diferente de 200 indica uma escrita ou leitura perdida
+    sys.exit(0 if set(write_statuses) | set(read_statuses) <= { 200 } else 1)
\ No newline at end of file
@@ -0,0 +1,12 @@
+import os
+from main import create_app, start_background_jobs
+
+# aplicação usada pelos servidores WSGI de produção (gunicorn wsgi:app)
+app = create_app()
+
+if __name__ == '__main__':
+    # servidor waitress: um único processo com várias threads
+    from waitress import serve
+    start_background_jobs()
+    serve(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", 5000)),
+        threads=int(os.environ.get("WEB_THREADS", 4)))
\ No newline at end of file